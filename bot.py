@@ -0,0 +1,350 @@
+# bot.py
+"""
+A placement-search bot for Tetris, used for the attract/demo mode and as the
+reference policy for simulations.
+
+Given a `TetrisLogic` state, the bot enumerates every (rotation, column)
+placement of the current piece that can be reached from where it is, looks one
+piece ahead with the next piece, and scores the resulting boards with a
+weighted sum of board features from `features` (aggregate height, holes and
+bumpiness by default; any of FEATURE_NAMES can be weighted) plus cleared lines.
+
+The search runs on a compact copy of the board where every row is an integer
+bit mask (bit x set = cell x filled), so collision tests and placements are a
+few integer operations per row. Board evaluations are memoized in a bounded
+transposition table keyed by a hash of those row masks, since many different
+move orders lead to the same board.
+"""
+from collections import OrderedDict
+from functools import lru_cache
+from input_manager import ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_HARD_DROP
+from features import board_to_masks, MaskBoard
+from logic import TetrisLogic, SHAPES, EVENT_SPAWN
+
+# Heuristic weights per unit of each feature (see `features.FEATURE_NAMES`), plus
+# "lines" for cleared lines. Lines are rewarded, the rest penalized.
+DEFAULT_WEIGHTS = {
+    "height": -0.51,
+    "lines": 0.76,
+    "holes": -0.36,
+    "bumpiness": -0.18,
+}
+
+
+def rotate_matrix(shape):
+    """Rotates a piece matrix 90 degrees clockwise, exactly like `TetrisLogic.rotate`."""
+    return [list(row) for row in zip(*shape[::-1])]
+
+
+def piece_rotations(shape):
+    """
+    Lists the distinct orientations of a piece, in rotation order.
+
+    Args:
+        shape (list of lists): The piece matrix in its current orientation.
+
+    Returns:
+        list: (rotations, width, row_masks) tuples, where `rotations` is how
+              many clockwise turns produce that orientation.
+    """
+    result = []
+    seen = set()
+    for turns in range(4):
+        masks = tuple(sum(1 << cx for cx, val in enumerate(row) if val) for row in shape)
+        if masks not in seen:
+            seen.add(masks)
+            result.append((turns, len(shape[0]), masks))
+        shape = rotate_matrix(shape)
+    return result
+
+
+@lru_cache(maxsize=None)
+def mask_cells(masks):
+    """Lists the (x, y) offsets of the filled cells of a piece orientation's row masks."""
+    return tuple((cx, cy) for cy, mask in enumerate(masks) for cx in range(mask.bit_length()) if mask >> cx & 1)
+
+
+def collides(rows, masks, x, y, width):
+    """
+    Checks whether a piece orientation overlaps the board or its edges.
+
+    Args:
+        rows (tuple): The board as row bit masks.
+        masks (tuple): The piece orientation's row bit masks.
+        x (int): The piece column.
+        y (int): The piece row.
+        width (int): The board width in cells.
+
+    Returns:
+        bool: True if the piece does not fit at (x, y).
+    """
+    if x < 0:
+        return True
+    for cy, mask in enumerate(masks):
+        shifted = mask << x
+        if shifted >> width:
+            return True
+        if y + cy >= len(rows):
+            return True
+        if y + cy >= 0 and rows[y + cy] & shifted:
+            return True
+    return False
+
+
+def place(rows, masks, x, y, width):
+    """
+    Locks a piece orientation into the board and clears any full rows.
+
+    Returns:
+        tuple: (new_rows, lines_cleared).
+    """
+    new_rows = list(rows)
+    for cy, mask in enumerate(masks):
+        new_rows[y + cy] |= mask << x
+    full = (1 << width) - 1
+    kept = [row for row in new_rows if row != full]
+    lines = len(new_rows) - len(kept)
+    return tuple([0] * lines + kept), lines
+
+
+class PlacementBot:
+    """
+    Chooses where to put the current piece by searching placements two pieces deep.
+
+    The first ply scores every reachable placement of the current piece; the
+    best `beam_width` of those are expanded with every placement of the next
+    piece, and the best combined result decides the move.
+    """
+    def __init__(self, weights=None, cache_size=65536, beam_width=5):
+        """
+        Initializes the bot.
+
+        Args:
+            weights (dict, optional): Heuristic weights. Defaults to DEFAULT_WEIGHTS.
+            cache_size (int, optional): The maximum number of cached board evaluations. Defaults to 65536.
+            beam_width (int, optional): How many first-ply placements get a second ply. Defaults to 5.
+        """
+        self.weights = weights or DEFAULT_WEIGHTS
+        # The board features the weights use ("lines" is scored separately).
+        self.feature_names = tuple(name for name in self.weights if name != "lines")
+        self.cache_size = cache_size
+        self.beam_width = beam_width
+        # Transposition table: board hash -> heuristic value, in least-recently-used order.
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rotations = [piece_rotations(shape) for shape in SHAPES]
+
+    def evaluate(self, rows, width, parent=None, placement=None):
+        """
+        Scores a board (without the line-clear bonus), using the transposition table.
+
+        When the board is `parent` with a piece placed and no line cleared, its
+        features are derived from the parent's in time proportional to the piece.
+
+        Args:
+            rows (tuple): The board as row bit masks, top row first.
+            width (int): The board width in cells.
+            parent (MaskBoard, optional): The measured board the piece was placed on. Defaults to None.
+            placement (tuple, optional): The (masks, x, y) of that piece. Defaults to None.
+
+        Returns:
+            float: The heuristic value; higher is better.
+        """
+        key = hash(rows)
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            return value
+        self.cache_misses += 1
+
+        features = self.measure(rows, width, parent, placement).features(self.feature_names)
+        value = 0.0
+        for name, weight in self.weights.items():
+            if name != "lines":
+                value += weight * features[name]
+        self.cache[key] = value
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return value
+
+    @staticmethod
+    def measure(rows, width, parent=None, placement=None):
+        """
+        Measures a board, incrementally from its parent when a placement is given.
+
+        Returns:
+            MaskBoard: The measured board.
+        """
+        if parent is None:
+            return MaskBoard(rows, width)
+        masks, x, y = placement
+        board = parent.copy(rows)
+        board.add_cells([(x + cx, y + cy) for cx, cy in mask_cells(masks)])
+        return board
+
+    def placements(self, rows, orientations, start_x, start_y, width):
+        """
+        Enumerates the placements reachable by rotating in place, sliding sideways, then dropping.
+
+        Args:
+            rows (tuple): The board as row bit masks.
+            orientations (list): The result of `piece_rotations` for the piece.
+            start_x (int): The piece's current column.
+            start_y (int): The piece's current row.
+            width (int): The board width in cells.
+
+        Returns:
+            list: (rotations, x, y, masks) for every reachable resting position.
+        """
+        result = []
+        for i, (turns, _, masks) in enumerate(orientations):
+            # Every intermediate rotation must fit, since `rotate` has no wall kicks.
+            if any(collides(rows, m, start_x, start_y, width) for _, _, m in orientations[:i + 1]):
+                continue
+            for direction in (-1, 1):
+                x = start_x if direction == -1 else start_x + 1
+                while not collides(rows, masks, x, start_y, width):
+                    y = start_y
+                    while not collides(rows, masks, x, y + 1, width):
+                        y += 1
+                    result.append((turns, x, y, masks))
+                    x += direction
+        return result
+
+    def choose(self, logic):
+        """
+        Picks the best placement for the current piece.
+
+        Args:
+            logic (TetrisLogic): The game to play. It is not modified.
+
+        Returns:
+            tuple: (rotations, x, score), or None if the piece cannot be placed.
+        """
+        width = len(logic.board[0])
+        rows = board_to_masks(logic.board)
+        root = MaskBoard(rows, width)
+        w_lines = self.weights["lines"]
+
+        # Boards where lines were cleared are measured from scratch; the rest
+        # are derived from the board the piece was placed on.
+        first = []
+        for turns, x, y, masks in self.placements(rows, piece_rotations(logic.current_piece),
+                                                  logic.piece_x, logic.piece_y, width):
+            after, lines = place(rows, masks, x, y, width)
+            parent = None if lines else root
+            first.append((self.evaluate(after, width, parent, (masks, x, y)) + w_lines * lines,
+                          lines, turns, x, after, parent, (masks, x, y)))
+        if not first:
+            return None
+        first.sort(key=lambda item: item[0], reverse=True)
+
+        # Second ply: the next piece spawns at the top center, like `spawn_piece`.
+        next_orientations = self.rotations[logic.next_piece_idx]
+        next_x = width // 2 - len(SHAPES[logic.next_piece_idx][0]) // 2
+        best = None
+        for _, lines, turns, x, after, parent, placement in first[:self.beam_width]:
+            board = self.measure(after, width, parent, placement)
+            follow_ups = []
+            for _, x2, y2, m in self.placements(after, next_orientations, next_x, 0, width):
+                after2, lines2 = place(after, m, x2, y2, width)
+                follow_ups.append(self.evaluate(after2, width, None if lines2 else board, (m, x2, y2))
+                                  + w_lines * lines2)
+            # Keep the first ply's line bonus; a dead end next turn is heavily penalized.
+            total = w_lines * lines + (max(follow_ups) if follow_ups else -1e9)
+            if best is None or total > best[2]:
+                best = (turns, x, total)
+        return best
+
+    def plan(self, logic):
+        """
+        Turns the chosen placement into the actions that perform it.
+
+        Args:
+            logic (TetrisLogic): The game to play.
+
+        Returns:
+            list: Actions from `input_manager` (rotations, sideways moves, then a hard drop).
+        """
+        choice = self.choose(logic)
+        if choice is None:
+            return [ACTION_HARD_DROP]
+        turns, x, _ = choice
+        dx = x - logic.piece_x
+        return [ACTION_ROTATE] * turns + [ACTION_RIGHT if dx > 0 else ACTION_LEFT] * abs(dx) + [ACTION_HARD_DROP]
+
+
+class DemoPlayer:
+    """
+    Plays a game on its own with `PlacementBot`, for the attract mode.
+
+    Owns its own `TetrisLogic`, performs one planned action every few frames
+    so the moves are visible, and restarts when the game ends.
+    """
+    def __init__(self, bot=None, frames_per_action=4, logic=None):
+        """
+        Initializes the demo game.
+
+        Args:
+            bot (PlacementBot, optional): The bot to play with. Defaults to a new PlacementBot.
+            frames_per_action (int, optional): Frames between two demo moves. Defaults to 4.
+            logic (TetrisLogic, optional): The game to play, e.g. one with a custom
+                                           board size. Defaults to a new standard game.
+        """
+        self.bot = bot or PlacementBot()
+        self.frames_per_action = frames_per_action
+        self.logic = logic or TetrisLogic()
+        self.logic.add_listener(self.on_logic_event)
+        self.actions = self.bot.plan(self.logic)
+        self.frame = 0
+
+    def on_logic_event(self, event, data):
+        """Plans the moves for each new piece as soon as it spawns."""
+        if event == EVENT_SPAWN and not self.logic.game_over:
+            self.actions = self.bot.plan(self.logic)
+
+    def update(self):
+        """Advances the demo by one frame."""
+        if self.logic.game_over:
+            self.logic.reset()
+            return
+        self.frame += 1
+        if self.frame < self.frames_per_action or not self.actions:
+            return
+        self.frame = 0
+
+        action = self.actions.pop(0)
+        if action == ACTION_ROTATE:
+            self.logic.rotate()
+        elif action == ACTION_LEFT:
+            self.logic.move(-1, 0)
+        elif action == ACTION_RIGHT:
+            self.logic.move(1, 0)
+        elif action == ACTION_HARD_DROP:
+            while self.logic.move(0, 1): pass
+            self.logic.lock_piece()
+
+
+if __name__ == "__main__":
+    # Quick benchmark: let the bot play and report decision time and cache use.
+    import time
+    bot = PlacementBot()
+    logic = TetrisLogic()
+    pieces = 0
+    started = time.perf_counter()
+    while not logic.game_over and pieces < 500:
+        for action in bot.plan(logic):
+            if action == ACTION_ROTATE:
+                logic.rotate()
+            elif action == ACTION_LEFT:
+                logic.move(-1, 0)
+            elif action == ACTION_RIGHT:
+                logic.move(1, 0)
+        while logic.move(0, 1): pass
+        logic.lock_piece()
+        pieces += 1
+    elapsed = time.perf_counter() - started
+    print(f"[BOT] {pieces} pieces, score {logic.score}, {elapsed / pieces * 1000:.2f} ms per decision, "
+          f"cache hits {bot.cache_hits} / misses {bot.cache_misses}")
@@ -5,20 +5,24 @@ Manages Discord Rich Presence integration for the game.
 This module uses the 'pypresence' library to connect to a user's Discord client
 and display their current in-game status, such as score, current state (in-menu, playing),
 and a button to download the game.
+
+'pypresence' is optional: it is only imported when `connect()` runs, so a
+missing install or a slow Discord handshake never holds up the game window.
 """
-from pypresence import Presence
 import time
+from telemetry import log
 
 class DiscordHandler:
     """
     Handles the connection and updates for Discord Rich Presence.
     
-    Tries to connect to Discord on initialization and provides a method
-    to update the presence information, respecting Discord's rate limits.
+    Connects to Discord through `connect()` (usually from a background thread
+    at startup) and provides a method to update the presence information,
+    respecting Discord's rate limits.
     """
     def __init__(self, app_id, download_url="https://github.com/MMETehrani/tetris-gui/releases"):
         """
-        Initializes the Discord handler and connects to the RPC server.
+        Initializes the Discord handler. Call `connect()` to reach the RPC server.
 
         Args:
             app_id (str): The Application ID from your Discord Developer Portal.
@@ -29,16 +33,28 @@ class DiscordHandler:
         self.rpc = None
         self.last_update = 0
         self.connected = False
-        
+
+    def connect(self):
+        """
+        Imports 'pypresence' and connects to the Discord client's RPC server.
+
+        This blocks for as long as the handshake takes, so the main app runs it
+        off the main thread. Any failure simply leaves the handler disconnected.
+
+        Returns:
+            bool: True if the connection succeeded, False otherwise.
+        """
         try:
+            from pypresence import Presence
             # Attempt to connect to the Discord client's RPC server.
             self.rpc = Presence(self.client_id)
             self.rpc.connect()
             self.connected = True
-            print("[DISCORD] Connected to Rich Presence!")
+            log("presence", echo="[DISCORD] Connected to Rich Presence!", connected=True)
         except Exception as e:
             # This can fail for many reasons, most commonly if Discord is not running.
-            print(f"[DISCORD] Connection failed (Is Discord open?): {e}")
+            log("presence", echo=f"[DISCORD] Connection failed (Is Discord open?): {e}", connected=False)
+        return self.connected
 
     def update_presence(self, state_text, details_text, small_text=None):
         """
@@ -76,10 +92,10 @@ class DiscordHandler:
                 buttons=[{"label": "Download Game", "url": self.download_url}]
             )
             self.last_update = current_time
-            print("[DISCORD] Presence updated.")
+            log("presence", state=state_text, details=details_text)
             
         except Exception as e:
             # If the update fails (e.g., Discord was closed), disable further attempts
             # to prevent spamming errors and causing potential game lag.
-            print(f"[DISCORD] Update error: {e}")
+            log("presence", echo=f"[DISCORD] Update error: {e}", error=str(e))
             self.connected = False
\ No newline at end of file
@@ -0,0 +1,217 @@
+# effects.py
+"""
+Visual feedback for locks and line clears: row flashes, particles and screen shake.
+
+The effects are driven entirely by the events `TetrisLogic` emits ("lock",
+"clear"), so the game rules never need to know they exist.
+
+Particles live in a fixed-size pool stored as NumPy arrays (one array per
+attribute, "struct of arrays"). Spawning writes into existing slots and the
+per-frame update is a handful of whole-array operations, so even a four-line
+clear creates no Python objects per particle and the frame cost stays flat.
+"""
+import numpy as np
+import pygame
+from logic import EVENT_LOCK, EVENT_CLEAR, EVENT_RESET
+from settings import BLOCK_SIZE, GRID_WIDTH, GRID_HEIGHT, SHAPE_COLORS
+
+
+class ParticlePool:
+    """
+    A fixed-capacity pool of particles updated in bulk.
+
+    New particles overwrite slots round-robin, so when the pool is full the
+    oldest particles are recycled instead of allocating more.
+    """
+    GRAVITY = 900.0  # Downward acceleration in pixels per second squared.
+
+    def __init__(self, capacity=1024):
+        """
+        Preallocates every particle attribute array.
+
+        Args:
+            capacity (int, optional): The maximum number of live particles. Defaults to 1024.
+        """
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)      # Seconds left; <= 0 means the slot is free.
+        self.max_life = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.cursor = 0
+        self.rng = np.random.default_rng()
+
+    def emit(self, xs, ys, colors, per_point, spread, speed=220.0, life=0.6):
+        """
+        Spawns bursts of particles around several points in one batch.
+
+        Args:
+            xs (list): The burst centers' x, in board pixels.
+            ys (list): The burst centers' y, in board pixels.
+            colors (list): One RGB color per burst.
+            per_point (int): How many particles each burst spawns.
+            spread (float): How far from its center a particle may start, in pixels.
+            speed (float, optional): The maximum initial speed in pixels per second. Defaults to 220.0.
+            life (float, optional): The maximum lifetime in seconds. Defaults to 0.6.
+        """
+        count = min(len(xs) * per_point, self.capacity)
+        if count == 0:
+            return
+        # The slots to (re)use, wrapping around the end of the pool.
+        idx = (self.cursor + np.arange(count)) % self.capacity
+        self.cursor = (self.cursor + count) % self.capacity
+
+        angle = self.rng.uniform(0.0, 2.0 * np.pi, count)
+        magnitude = self.rng.uniform(0.2, 1.0, count) * speed
+        self.x[idx] = np.repeat(np.asarray(xs, dtype=np.float32), per_point)[:count] + self.rng.uniform(-spread, spread, count)
+        self.y[idx] = np.repeat(np.asarray(ys, dtype=np.float32), per_point)[:count] + self.rng.uniform(-spread, spread, count)
+        self.vx[idx] = np.cos(angle) * magnitude
+        self.vy[idx] = np.sin(angle) * magnitude - speed * 0.5  # Bias upwards.
+        lifetimes = self.rng.uniform(0.5, 1.0, count) * life
+        self.life[idx] = lifetimes
+        self.max_life[idx] = lifetimes
+        self.color[idx] = np.repeat(np.asarray(colors, dtype=np.uint8), per_point, axis=0)[:count]
+
+    def update(self, dt):
+        """
+        Advances every particle by `dt` seconds with whole-array operations.
+
+        Args:
+            dt (float): The elapsed time in seconds.
+        """
+        self.vy += self.GRAVITY * dt
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        self.life -= dt
+
+    def draw(self, surface, origin_x, origin_y):
+        """
+        Draws the live particles as small squares that shrink as they fade.
+
+        Args:
+            surface (pygame.Surface): The surface to draw onto.
+            origin_x (int): The screen x of the board's top-left corner.
+            origin_y (int): The screen y of the board's top-left corner.
+        """
+        alive = np.flatnonzero(self.life > 0)
+        if alive.size == 0:
+            return
+        sizes = (1 + 4 * self.life[alive] / self.max_life[alive]).astype(np.int32)
+        xs = (self.x[alive] + origin_x).astype(np.int32)
+        ys = (self.y[alive] + origin_y).astype(np.int32)
+        colors = self.color[alive]
+        for px, py, size, color in zip(xs.tolist(), ys.tolist(), sizes.tolist(), colors.tolist()):
+            surface.fill(color, (px, py, size, size))
+
+
+class EffectsManager:
+    """
+    Turns `TetrisLogic` events into row flashes, particle bursts and screen shake.
+
+    Register `on_logic_event` with `TetrisLogic.add_listener`, call `update`
+    once per frame and `draw` after the board has been drawn.
+    """
+    FLASH_TIME = 0.25        # Seconds a cleared row stays lit.
+    SHAKE_DECAY = 2.5        # How fast the shake "trauma" fades per second.
+    MAX_SHAKE = 12           # Maximum shake offset in pixels.
+
+    def __init__(self, block_size=BLOCK_SIZE, grid_width=GRID_WIDTH, grid_height=GRID_HEIGHT):
+        """
+        Initializes the effects and preallocates their state.
+
+        Args:
+            block_size (int, optional): The size of a board cell in pixels. Defaults to BLOCK_SIZE.
+            grid_width (int, optional): The board width in cells. Defaults to GRID_WIDTH.
+            grid_height (int, optional): The board height in cells. Defaults to GRID_HEIGHT.
+        """
+        self.block_size = block_size
+        self.particles = ParticlePool()
+        # Remaining flash time per board row.
+        self.row_flash = np.zeros(grid_height, dtype=np.float32)
+        # One white strip reused for every flashing row; only its alpha changes.
+        self.flash_strip = pygame.Surface((grid_width * block_size, block_size))
+        self.flash_strip.fill((255, 255, 255))
+        self.trauma = 0.0
+        self.rng = np.random.default_rng()
+
+    def on_logic_event(self, event, data):
+        """
+        Reacts to an event emitted by `TetrisLogic`.
+
+        Args:
+            event (str): The event type (EVENT_LOCK, EVENT_CLEAR, ...).
+            data (dict): The event payload.
+        """
+        size = self.block_size
+        if event == EVENT_LOCK:
+            # A small puff under each block of the piece that just landed.
+            cells = data["cells"]
+            self.particles.emit([(x + 0.5) * size for x, _, _ in cells],
+                                [(y + 1) * size for _, y, _ in cells],
+                                [SHAPE_COLORS[(value - 1) % len(SHAPE_COLORS)][1] for _, _, value in cells],
+                                per_point=3, spread=size / 2, speed=80.0, life=0.3)
+            self.trauma = min(1.0, self.trauma + 0.1)
+
+        elif event == EVENT_CLEAR:
+            xs, ys, colors = [], [], []
+            for y, row in zip(data["rows"], data["values"]):
+                self.row_flash[y] = self.FLASH_TIME
+                for x, value in enumerate(row):
+                    xs.append((x + 0.5) * size)
+                    ys.append((y + 0.5) * size)
+                    colors.append(SHAPE_COLORS[(value - 1) % len(SHAPE_COLORS)][0])
+            # Every block of every cleared row bursts, all in one batch.
+            self.particles.emit(xs, ys, colors, per_point=6, spread=size / 2)
+            # A four-line clear shakes hardest.
+            self.trauma = min(1.0, self.trauma + 0.25 * len(data["rows"]))
+
+        elif event == EVENT_RESET:
+            self.clear()
+
+    def clear(self):
+        """Removes every active effect at once (e.g., when a new game starts)."""
+        self.particles.life.fill(0)
+        self.row_flash.fill(0)
+        self.trauma = 0.0
+
+    def update(self, dt):
+        """
+        Advances all effects by `dt` seconds.
+
+        Args:
+            dt (float): The elapsed time in seconds.
+        """
+        self.particles.update(dt)
+        np.subtract(self.row_flash, dt, out=self.row_flash)
+        np.maximum(self.row_flash, 0, out=self.row_flash)
+        self.trauma = max(0.0, self.trauma - self.SHAKE_DECAY * dt)
+
+    def shake_offset(self):
+        """
+        Returns the current screen shake offset.
+
+        Returns:
+            tuple: The (dx, dy) pixel offset to apply to the game area.
+        """
+        if self.trauma <= 0:
+            return 0, 0
+        # Squaring the trauma makes small bumps subtle and big clears punchy.
+        magnitude = self.MAX_SHAKE * self.trauma * self.trauma
+        dx, dy = self.rng.uniform(-magnitude, magnitude, 2)
+        return int(dx), int(dy)
+
+    def draw(self, surface, origin_x, origin_y):
+        """
+        Draws the row flashes and particles over the board.
+
+        Args:
+            surface (pygame.Surface): The surface to draw onto.
+            origin_x (int): The screen x of the board's top-left corner.
+            origin_y (int): The screen y of the board's top-left corner.
+        """
+        for y in np.flatnonzero(self.row_flash).tolist():
+            self.flash_strip.set_alpha(int(220 * self.row_flash[y] / self.FLASH_TIME))
+            surface.blit(self.flash_strip, (origin_x, origin_y + y * self.block_size))
+        self.particles.draw(surface, origin_x, origin_y)
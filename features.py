@@ -0,0 +1,342 @@
+# features.py
+"""
+Board features for bots, reward shaping and post-game analytics.
+
+The standard board metrics, per board:
+
+    "height"           sum of the column heights (aggregate height)
+    "max_height"       the tallest column
+    "holes"            empty cells with a filled cell somewhere above them
+    "bumpiness"        sum of the height differences between neighbouring columns
+    "wells"            sum of the well depths (how far a column sits below both
+                       neighbours; the walls count as full height)
+    "row_transitions"  filled/empty changes along each row, the walls counting as filled
+
+They come in four forms:
+
+* `board_features` / `mask_features` compute them from scratch for one board,
+  the latter from the row bit masks the bot searches with (bit x set = cell x filled).
+* `batch_features` computes them with NumPy for a whole stack of boards at
+  once, e.g. the board channel of `VectorTetrisEnv` observations.
+* `MaskBoard` holds the measurements of one board so that a placement can
+  update them in time proportional to the piece; the bot's search uses it.
+* `FeatureTracker` follows a live `TetrisLogic` through its events and keeps
+  the features up to date: a lock only touches the piece's columns and rows,
+  and a line clear or garbage only walks the row masks, never the cells. The
+  game window tracks the player's game with it for post-game analytics.
+"""
+import numpy as np
+from logic import EVENT_LOCK, EVENT_CLEAR, EVENT_GARBAGE, EVENT_RESET, EVENT_RESTORE
+
+FEATURE_NAMES = ("height", "max_height", "holes", "bumpiness", "wells", "row_transitions")
+
+
+def board_to_masks(board):
+    """Converts a `TetrisLogic.board` (list of rows) into a tuple of row bit masks."""
+    return tuple(sum(1 << x for x, val in enumerate(row) if val) for row in board)
+
+
+def mask_heights_holes(rows, width):
+    """
+    Finds the column heights and the number of holes in one pass over the rows.
+
+    Args:
+        rows (tuple): The board as row bit masks, top row first.
+        width (int): The board width in cells.
+
+    Returns:
+        tuple: (heights, holes), the list of column heights and the total hole count.
+    """
+    height = len(rows)
+    heights = [0] * width
+    holes = 0
+    seen = 0  # Columns that already have a block above the current row.
+    for y, row in enumerate(rows):
+        # Empty cells under a block are holes.
+        holes += bin(seen & ~row).count("1")
+        new = row & ~seen
+        while new:
+            bit = new & -new
+            heights[bit.bit_length() - 1] = height - y
+            new ^= bit
+        seen |= row
+    return heights, holes
+
+
+def well_depths(heights, board_height):
+    """
+    Measures how deep each column sits below both of its neighbours.
+
+    Args:
+        heights (list): The column heights.
+        board_height (int): The board height, used for the walls.
+
+    Returns:
+        list: The well depth of every column (0 where there is no well).
+    """
+    padded = [board_height] + list(heights) + [board_height]
+    return [max(0, min(padded[x], padded[x + 2]) - padded[x + 1]) for x in range(len(heights))]
+
+
+def row_transitions(mask, width):
+    """Counts the filled/empty changes along one row mask, the walls counting as filled."""
+    padded = (mask << 1) | 1 | (1 << (width + 1))
+    return bin((padded ^ (padded >> 1)) & ((1 << (width + 1)) - 1)).count("1")
+
+
+def summarize(heights, holes, transitions, board_height, names=FEATURE_NAMES):
+    """
+    Builds the feature dict from the column heights and the precomputed counts.
+
+    Args:
+        heights (list): The column heights.
+        holes (int): The number of holes.
+        transitions (list): The transitions of every row (only read for "row_transitions").
+        board_height (int): The board height, used for the walls.
+        names (tuple, optional): The features wanted. Defaults to all of FEATURE_NAMES.
+
+    Returns:
+        dict: Feature name -> value, for the requested names.
+    """
+    values = {}
+    for name in names:
+        if name == "height":
+            values[name] = sum(heights)
+        elif name == "max_height":
+            values[name] = max(heights)
+        elif name == "holes":
+            values[name] = holes
+        elif name == "bumpiness":
+            values[name] = sum(abs(heights[x] - heights[x + 1]) for x in range(len(heights) - 1))
+        elif name == "wells":
+            values[name] = sum(well_depths(heights, board_height))
+        elif name == "row_transitions":
+            values[name] = sum(transitions)
+        else:
+            raise KeyError(f"unknown board feature: {name}")
+    return values
+
+
+class MaskBoard:
+    """
+    A board as row bit masks together with its column heights and hole count.
+
+    Placing a piece without clearing lines changes only the piece's columns,
+    so `copy()` followed by `add_cells()` gives the features of the resulting
+    board in time proportional to the piece, instead of a pass over every row.
+    The per-row transitions are only computed once a feature needs them.
+    """
+    __slots__ = ("rows", "width", "heights", "holes", "transitions")
+
+    def __init__(self, rows, width):
+        """
+        Measures a board from scratch.
+
+        Args:
+            rows (tuple or list): The board as row bit masks, top row first.
+            width (int): The board width in cells.
+        """
+        self.rows = rows
+        self.width = width
+        self.heights, self.holes = mask_heights_holes(rows, width)
+        self.transitions = None
+
+    def copy(self, rows):
+        """
+        Returns a copy of the measurements, for a board that differs from this
+        one only by cells that `add_cells` will then report.
+
+        Args:
+            rows (tuple or list): The new board's row masks.
+
+        Returns:
+            MaskBoard: The copy.
+        """
+        board = MaskBoard.__new__(MaskBoard)
+        board.rows = rows
+        board.width = self.width
+        board.heights = list(self.heights)
+        board.holes = self.holes
+        board.transitions = None if self.transitions is None else list(self.transitions)
+        return board
+
+    def add_cells(self, cells):
+        """
+        Updates the measurements for cells that were filled in `rows` (no line cleared).
+
+        A cell above its column's top raises the column, and the empty cells it
+        covers become holes; a cell below the top fills a hole.
+
+        Args:
+            cells (list): The (x, y) cells that were filled.
+        """
+        height = len(self.rows)
+        heights = self.heights
+        old = list(heights)
+        holes = self.holes
+        rising = {}  # Column -> cells placed above its old top.
+        for x, y in cells:
+            if height - y > old[x]:
+                rising[x] = rising.get(x, 0) + 1
+                if height - y > heights[x]:
+                    heights[x] = height - y
+            else:
+                holes -= 1
+        for x, count in rising.items():
+            holes += heights[x] - old[x] - count
+        self.holes = holes
+        if self.transitions is not None:
+            for y in {y for _, y in cells}:
+                self.transitions[y] = row_transitions(self.rows[y], self.width)
+
+    def features(self, names=FEATURE_NAMES):
+        """
+        Returns the board's features.
+
+        Args:
+            names (tuple, optional): The features wanted. Defaults to all of FEATURE_NAMES.
+
+        Returns:
+            dict: Feature name -> value.
+        """
+        if self.transitions is None and "row_transitions" in names:
+            self.transitions = [row_transitions(row, self.width) for row in self.rows]
+        return summarize(self.heights, self.holes, self.transitions, len(self.rows), names)
+
+
+def mask_features(rows, width, names=FEATURE_NAMES):
+    """
+    Computes the features of a board given as row bit masks.
+
+    Args:
+        rows (tuple): The board as row bit masks, top row first.
+        width (int): The board width in cells.
+        names (tuple, optional): The features wanted. Defaults to all of FEATURE_NAMES.
+
+    Returns:
+        dict: Feature name -> value.
+    """
+    return MaskBoard(rows, width).features(names)
+
+
+def board_features(board):
+    """
+    Computes every feature of a `TetrisLogic.board`.
+
+    Args:
+        board (list of lists): The board, top row first.
+
+    Returns:
+        dict: FEATURE_NAMES -> value.
+    """
+    return mask_features(board_to_masks(board), len(board[0]))
+
+
+def batch_features(boards):
+    """
+    Computes every feature for a stack of boards at once.
+
+    Args:
+        boards (np.ndarray): Boards of shape (N, height, width); non-zero cells are filled.
+
+    Returns:
+        dict: FEATURE_NAMES -> array of shape (N,), plus "column_heights" and
+              "well_depths" of shape (N, width).
+    """
+    filled = np.asarray(boards) != 0
+    count, height, width = filled.shape
+    # The first filled row of each column gives its height; empty columns are 0.
+    top = filled.argmax(axis=1)
+    heights = np.where(filled.any(axis=1), height - top, 0)
+    # Everything filled in a column lies at or under its top, so the rest are holes.
+    holes = heights - filled.sum(axis=1)
+    walls = np.full((count, 1), height)
+    padded = np.concatenate([walls, heights, walls], axis=1)
+    wells = np.maximum(0, np.minimum(padded[:, :-2], padded[:, 2:]) - heights)
+    side = np.ones((count, height, 1), dtype=bool)
+    rows = np.concatenate([side, filled, side], axis=2)
+    transitions = (rows[:, :, 1:] != rows[:, :, :-1]).sum(axis=(1, 2))
+    return {
+        "height": heights.sum(axis=1),
+        "max_height": heights.max(axis=1),
+        "holes": holes.sum(axis=1),
+        "bumpiness": np.abs(np.diff(heights, axis=1)).sum(axis=1),
+        "wells": wells.sum(axis=1),
+        "row_transitions": transitions,
+        "column_heights": heights,
+        "well_depths": wells,
+    }
+
+
+class FeatureTracker:
+    """
+    Keeps the features of a live game up to date from its events.
+
+    The tracker mirrors the board as a `MaskBoard`. A lock only updates the
+    piece's rows and columns. A line clear deletes the cleared row masks in
+    place and garbage shifts them; both then re-measure the masks, which is
+    a pass over the rows but never over the cells. Only a reset or a restore
+    reads the game's board again.
+    """
+    def __init__(self, logic):
+        """
+        Measures the game's board and starts following the game.
+
+        Args:
+            logic (TetrisLogic): The game to follow.
+        """
+        self.logic = logic
+        self.rebuild()
+        logic.add_listener(self.on_logic_event)
+
+    def rebuild(self):
+        """Measures the game's board from scratch (on reset and restore)."""
+        board = self.logic.board
+        self._measure(list(board_to_masks(board)), len(board[0]))
+
+    def _measure(self, rows, width):
+        """Measures a list of row masks, including the per-row transitions."""
+        self.board = MaskBoard(rows, width)
+        self.board.features(("row_transitions",))
+
+    def on_logic_event(self, event, data):
+        """Applies one game event; see the `logic` module docstring."""
+        board = self.board
+        rows = board.rows
+        if event == EVENT_LOCK:
+            cells = [(x, y) for x, y, _ in data["cells"]]
+            for x, y in cells:
+                rows[y] |= 1 << x
+            board.add_cells(cells)
+        elif event == EVENT_CLEAR:
+            cleared = data["rows"]
+            for y in reversed(cleared):
+                del rows[y]
+            rows[0:0] = [0] * len(cleared)
+            self._measure(rows, board.width)
+        elif event == EVENT_GARBAGE:
+            lines, hole = data["lines"], data["hole"]
+            mask = ((1 << board.width) - 1) & ~(1 << hole)
+            self._measure(rows[lines:] + [mask] * lines, board.width)
+        elif event in (EVENT_RESET, EVENT_RESTORE):
+            self.rebuild()
+
+    def features(self, names=FEATURE_NAMES):
+        """
+        Returns the current features.
+
+        Args:
+            names (tuple, optional): The features wanted. Defaults to all of FEATURE_NAMES.
+
+        Returns:
+            dict: Feature name -> value.
+        """
+        return self.board.features(names)
+
+    def column_heights(self):
+        """Returns the current column heights."""
+        return list(self.board.heights)
+
+    def close(self):
+        """Stops following the game."""
+        self.logic.remove_listener(self.on_logic_event)
@@ -0,0 +1,248 @@
+# fonts.py
+"""
+Resolves and loads the fonts used by the game's UI.
+
+`pygame.font.SysFont` rebuilds the whole system font table the first time it
+is called (on Linux this shells out to fontconfig), which is one of the slowest
+parts of starting the game. This module resolves each requested font once,
+remembers the resulting file path in the local store (the per-user data
+directory, see `store`), and on later runs loads the font file directly
+without scanning the system. A font that was not found is looked up again
+once the cached miss is older than FONT_MISS_RETRY_S, so installing it later
+takes effect.
+
+Fonts shipped with the game in `assets/fonts/` take priority over system fonts,
+so a build that bundles them looks the same on every machine and never scans
+the system at all.
+
+It also provides `GlyphAtlas`, which pre-renders a fixed character set once so
+frequently changing text (scores, leaderboard rows) can be composed from blits
+instead of rasterizing every string with `Font.render`.
+"""
+import os
+import string
+import sys
+import time
+import pygame
+from store import STORE, DOC_FONT_CACHE
+
+# Seconds before a font that was not installed is looked up again.
+FONT_MISS_RETRY_S = 24 * 60 * 60
+
+# Bundled fonts live next to the code, or inside the PyInstaller bundle when frozen
+# (add them to the build with `--add-data "assets/fonts;assets/fonts"`).
+BUNDLED_FONT_DIR = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "assets", "fonts")
+
+# The characters every atlas pre-renders: everything the HUD normally shows.
+ATLAS_CHARSET = string.digits + string.ascii_uppercase + " .,:;!?'\"-_+/()#%&*<>[]=@"
+
+
+def _cached_font(key):
+    """
+    Looks up a resolved font in the cache.
+
+    Entries are "name|bold" -> [font_path, synthetic_bold], or
+    [None, synthetic_bold, checked_time] when pygame fell back to its built-in font.
+
+    Returns:
+        list: The entry, or None if the font has to be resolved (again).
+    """
+    entry = STORE.get(DOC_FONT_CACHE, {}).get(key)
+    if entry is None:
+        return None
+    if entry[0] is None:
+        # Retry misses now and then; entries without a time predate the retry.
+        if len(entry) < 3 or time.time() - entry[2] > FONT_MISS_RETRY_S:
+            return None
+    elif not os.path.exists(entry[0]):
+        # Trust the cache only while the file is still installed.
+        return None
+    return entry
+
+
+def find_bundled_font(name, bold=False):
+    """
+    Looks for a font file shipped in `assets/fonts/`.
+
+    Files are named after the lowercase font name without spaces, with a
+    "-bold" suffix for the bold face (e.g., "consolas-bold.ttf").
+
+    Args:
+        name (str): The font name (e.g., "Comic Sans MS").
+        bold (bool, optional): Whether a bold face is wanted. Defaults to False.
+
+    Returns:
+        tuple: (path, synthetic_bold), or None if no bundled file matches.
+    """
+    base = name.lower().replace(" ", "")
+    candidates = [(f"{base}-bold", False), (base, True)] if bold else [(base, False)]
+    for stem, synthetic_bold in candidates:
+        for ext in (".ttf", ".otf"):
+            path = os.path.join(BUNDLED_FONT_DIR, stem + ext)
+            if os.path.exists(path):
+                return path, synthetic_bold
+    return None
+
+
+def resolve_font(name, bold=False):
+    """
+    Finds the font file to use for a font name: a bundled one if available,
+    otherwise the one pygame would pick from the system fonts.
+
+    Args:
+        name (str): The system font name (e.g., "Consolas").
+        bold (bool, optional): Whether a bold face is wanted. Defaults to False.
+
+    Returns:
+        tuple: (path, synthetic_bold) where `path` is the font file (None for
+               pygame's built-in font) and `synthetic_bold` tells whether pygame
+               has to embolden the glyphs itself because no bold face exists.
+    """
+    bundled = find_bundled_font(name, bold)
+    if bundled:
+        return bundled
+
+    key = f"{name}|{bold}"
+    entry = _cached_font(key)
+    if entry is not None:
+        return entry[0], entry[1]
+
+    resolved = []
+
+    def capture(path, size, set_bold, set_italic):
+        # SysFont hands the result of its lookup to this constructor, which
+        # gives us exactly the path and style flags it settled on.
+        resolved.append((path, set_bold))
+        return None
+
+    pygame.font.SysFont(name, 1, bold=bold, constructor=capture)
+    path, synthetic_bold = resolved[0]
+    cache = dict(STORE.get(DOC_FONT_CACHE, {}))
+    cache[key] = [path, synthetic_bold] if path else [None, synthetic_bold, round(time.time())]
+    # Written in the background, so resolving fonts never waits on the disk.
+    STORE.put(DOC_FONT_CACHE, cache)
+    return path, synthetic_bold
+
+
+def load_font(name, size, bold=False):
+    """
+    Creates a `pygame.font.Font` for a system font, using the path cache.
+
+    This is a drop-in replacement for `pygame.font.SysFont(name, size, bold=bold)`.
+
+    Args:
+        name (str): The system font name.
+        size (int): The font size in points.
+        bold (bool, optional): Whether to use a bold face. Defaults to False.
+
+    Returns:
+        pygame.font.Font: The loaded font.
+    """
+    path, synthetic_bold = resolve_font(name, bold)
+    font = pygame.font.Font(path, size)
+    if synthetic_bold:
+        font.set_bold(True)
+    return font
+
+
+class GlyphAtlas:
+    """
+    A pre-rendered strip of glyphs for one font and color.
+
+    Every character of the charset is rendered once into a single surface;
+    text is then composed by blitting areas of that surface. Characters outside
+    the charset (e.g., lowercase letters in a player name) are rendered on first
+    use and kept as well, so any string still works.
+    """
+    # How many composed strings to keep before the render cache is reset.
+    MAX_CACHED_STRINGS = 64
+
+    def __init__(self, font, color, charset=ATLAS_CHARSET):
+        """
+        Renders the charset into the atlas surface.
+
+        Args:
+            font (pygame.font.Font): The font to render with.
+            color (tuple): The RGB text color.
+            charset (str, optional): The characters to pre-render. Defaults to ATLAS_CHARSET.
+        """
+        self.font = font
+        self.color = color
+        self.height = font.get_height()
+
+        glyphs = [font.render(ch, True, color) for ch in charset]
+        self.surface = pygame.Surface((sum(g.get_width() for g in glyphs), self.height), pygame.SRCALPHA)
+        # Maps each character to (source surface, source area) for blitting.
+        self.glyphs = {}
+        x = 0
+        for ch, glyph in zip(charset, glyphs):
+            # A plain alpha blit onto a transparent surface would darken the
+            # anti-aliased edges; RGBA_MAX copies the glyph's pixels unchanged.
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.glyphs[ch] = (self.surface, pygame.Rect(x, 0, glyph.get_width(), self.height))
+            x += glyph.get_width()
+        self._rendered = {}
+
+    def glyph(self, ch):
+        """Returns the (surface, area) pair for a character, rendering it if it is new."""
+        entry = self.glyphs.get(ch)
+        if entry is None:
+            extra = self.font.render(ch, True, self.color)
+            entry = self.glyphs[ch] = (extra, extra.get_rect())
+        return entry
+
+    def size(self, text):
+        """
+        Measures a string as the atlas would draw it.
+
+        Args:
+            text (str): The text to measure.
+
+        Returns:
+            tuple: The (width, height) in pixels.
+        """
+        return sum(self.glyph(ch)[1].width for ch in text), self.height
+
+    def blit(self, target, text, pos, special_flags=0):
+        """
+        Draws a string glyph by glyph onto a surface with a single `blits` call.
+
+        Args:
+            target (pygame.Surface): The surface to draw onto.
+            text (str): The text to draw.
+            pos (tuple): The (x, y) top-left position.
+            special_flags (int, optional): Blend flags for every glyph blit. Defaults to 0.
+
+        Returns:
+            pygame.Rect: The area covered by the text.
+        """
+        x, y = pos
+        batch = []
+        for ch in text:
+            source, area = self.glyph(ch)
+            batch.append((source, (x, y), area, special_flags))
+            x += area.width
+        target.blits(batch, doreturn=False)
+        return pygame.Rect(pos[0], y, x - pos[0], self.height)
+
+    def render(self, text):
+        """
+        Composes a string into its own surface, like `Font.render` but from the atlas.
+
+        Recently composed strings are cached, so text that rarely changes
+        (a score between line clears, leaderboard names) costs a single blit.
+
+        Args:
+            text (str): The text to compose.
+
+        Returns:
+            pygame.Surface: A per-pixel-alpha surface containing the text.
+        """
+        surf = self._rendered.get(text)
+        if surf is None:
+            if len(self._rendered) >= self.MAX_CACHED_STRINGS:
+                self._rendered.clear()
+            surf = pygame.Surface(self.size(text), pygame.SRCALPHA)
+            self.blit(surf, text, (0, 0), pygame.BLEND_RGBA_MAX)
+            self._rendered[text] = surf
+        return surf
@@ -0,0 +1,206 @@
+# input_manager.py
+"""
+Turns raw keyboard events into a timed stream of game actions.
+
+Instead of moving the piece the moment a KEYDOWN arrives, every key press is
+timestamped and converted into an action. Held keys then repeat on their own
+schedule: horizontal movement uses delayed auto-shift (DAS, the pause before
+repeating starts) and the auto-repeat rate (ARR, the interval between repeats),
+and soft drop repeats at its own rate. The simulation pulls the actions that
+fall inside each fixed timestep, so piece movement no longer depends on how
+many frames were drawn or when the event queue happened to be read.
+"""
+import heapq
+import pygame
+from settings import DAS_MS, ARR_MS, SOFT_DROP_MS
+
+# --- Actions ---
+ACTION_LEFT = "left"
+ACTION_RIGHT = "right"
+ACTION_ROTATE = "rotate"
+ACTION_SOFT_DROP = "soft_drop"
+ACTION_HARD_DROP = "hard_drop"
+
+# Default key bindings for the PLAYING state.
+KEY_BINDINGS = {
+    pygame.K_LEFT: ACTION_LEFT,
+    pygame.K_RIGHT: ACTION_RIGHT,
+    pygame.K_UP: ACTION_ROTATE,
+    pygame.K_DOWN: ACTION_SOFT_DROP,
+    pygame.K_SPACE: ACTION_HARD_DROP,
+}
+
+ACTIONS = (ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_SOFT_DROP, ACTION_HARD_DROP)
+
+# The only event types the game reacts to. Everything else (mouse motion,
+# joystick, touch, ...) is dropped by SDL before it reaches the Python queue.
+# TEXTINPUT must stay allowed: pygame fills `KEYDOWN.unicode` from it, and the
+# login screen relies on that. The window events keep resizing working.
+ALLOWED_EVENTS = [
+    pygame.QUIT,
+    pygame.KEYDOWN,
+    pygame.KEYUP,
+    pygame.TEXTINPUT,
+    pygame.VIDEORESIZE,
+    pygame.VIDEOEXPOSE,
+    pygame.WINDOWSIZECHANGED,
+    pygame.WINDOWFOCUSLOST,
+]
+
+
+def bindings_to_names(bindings):
+    """
+    Converts key bindings to a saveable form.
+
+    Args:
+        bindings (dict): Maps pygame key codes to actions.
+
+    Returns:
+        dict: Maps key names (e.g., "left", "space") to actions.
+    """
+    return {pygame.key.name(key): action for key, action in bindings.items()}
+
+
+def bindings_from_names(names):
+    """
+    Converts saved key bindings back to key codes. Unknown keys and actions are skipped.
+
+    Args:
+        names (dict): Maps key names to actions, as made by `bindings_to_names`.
+
+    Returns:
+        dict: Maps pygame key codes to actions, or KEY_BINDINGS if nothing usable was saved.
+    """
+    bindings = {}
+    for name, action in names.items():
+        if action not in ACTIONS:
+            continue
+        try:
+            bindings[pygame.key.key_code(name)] = action
+        except ValueError:
+            continue
+    return bindings or KEY_BINDINGS
+
+
+def restrict_event_queue():
+    """Blocks every event type the game does not handle, reducing event-queue overhead."""
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(ALLOWED_EVENTS)
+
+
+class InputManager:
+    """
+    Buffers gameplay input as timestamped actions with DAS/ARR auto-repeat.
+
+    Actions are stored as (time_ms, sequence, action, is_repeat) tuples in a
+    heap, so presses and generated repeats always come out in time order.
+    """
+    def __init__(self, das_ms=DAS_MS, arr_ms=ARR_MS, soft_drop_ms=SOFT_DROP_MS, bindings=KEY_BINDINGS):
+        """
+        Initializes the input manager.
+
+        Args:
+            das_ms (int, optional): Delay before a held horizontal key starts repeating. Defaults to DAS_MS.
+            arr_ms (int, optional): Interval between horizontal repeats. Defaults to ARR_MS.
+            soft_drop_ms (int, optional): Interval between soft drop repeats. Defaults to SOFT_DROP_MS.
+            bindings (dict, optional): Maps pygame key codes to actions. Defaults to KEY_BINDINGS.
+        """
+        self.das_ms = das_ms
+        self.arr_ms = arr_ms
+        self.soft_drop_ms = soft_drop_ms
+        self.bindings = bindings
+        self.reset()
+
+    def reset(self):
+        """Forgets all held keys and queued actions (e.g., when a new game starts)."""
+        self.queue = []
+        self.sequence = 0
+        # Held keys that auto-repeat: action -> time of its next repeat.
+        self.next_repeat = {}
+        # Horizontal keys currently held, most recently pressed last.
+        self.horizontal_held = []
+
+    def push(self, time_ms, action, is_repeat=False):
+        """Adds an action to the queue at the given time."""
+        heapq.heappush(self.queue, (time_ms, self.sequence, action, is_repeat))
+        self.sequence += 1
+
+    def process_event(self, event, time_ms):
+        """
+        Converts a pygame event into queued actions and held-key state.
+
+        Args:
+            event (pygame.event.Event): The event to process.
+            time_ms (int): When the event was read, in `pygame.time.get_ticks()` milliseconds.
+
+        Returns:
+            bool: True if the event was a gameplay key, False otherwise.
+        """
+        if event.type == pygame.WINDOWFOCUSLOST:
+            # Key releases are not delivered to an unfocused window, so stop all repeats.
+            self.next_repeat.clear()
+            self.horizontal_held.clear()
+            return False
+
+        if event.type not in (pygame.KEYDOWN, pygame.KEYUP):
+            return False
+        action = self.bindings.get(event.key)
+        if action is None:
+            return False
+
+        if event.type == pygame.KEYDOWN:
+            self.push(time_ms, action)
+            if action in (ACTION_LEFT, ACTION_RIGHT):
+                # The newest direction takes over; the other one stops repeating.
+                if action in self.horizontal_held:
+                    self.horizontal_held.remove(action)
+                self.horizontal_held.append(action)
+                self.next_repeat.pop(ACTION_LEFT, None)
+                self.next_repeat.pop(ACTION_RIGHT, None)
+                self.next_repeat[action] = time_ms + self.das_ms
+            elif action == ACTION_SOFT_DROP:
+                self.next_repeat[action] = time_ms + self.soft_drop_ms
+        else:
+            self.next_repeat.pop(action, None)
+            if action in self.horizontal_held:
+                was_active = self.horizontal_held[-1] == action
+                self.horizontal_held.remove(action)
+                # If the other direction is still held, it resumes after a fresh DAS delay.
+                if was_active and self.horizontal_held:
+                    self.next_repeat[self.horizontal_held[-1]] = time_ms + self.das_ms
+        return True
+
+    def poll(self, now_ms):
+        """
+        Generates the auto-repeat actions of held keys up to the given time.
+
+        Each repeat gets the exact time it was due, not the time of the frame
+        that happened to generate it.
+
+        Args:
+            now_ms (int): The current time in milliseconds.
+        """
+        for action, due in list(self.next_repeat.items()):
+            interval = self.soft_drop_ms if action == ACTION_SOFT_DROP else self.arr_ms
+            # An interval of 0 means "as fast as possible"; 1 ms keeps the loop finite.
+            interval = max(interval, 1)
+            while due <= now_ms:
+                self.push(due, action, is_repeat=True)
+                due += interval
+            self.next_repeat[action] = due
+
+    def pop_actions(self, until_ms):
+        """
+        Removes and returns every queued action due at or before a given time.
+
+        Args:
+            until_ms (float): The end of the simulation step being run.
+
+        Returns:
+            list: (action, is_repeat) pairs in time order.
+        """
+        actions = []
+        while self.queue and self.queue[0][0] <= until_ms:
+            _, _, action, is_repeat = heapq.heappop(self.queue)
+            actions.append((action, is_repeat))
+        return actions
@@ -5,10 +5,47 @@ Handles the core game logic for the Tetris game.
 This module defines the tetromino shapes, the game board, and the rules for
 how pieces move, rotate, and interact with the board. It manages the game state,
 including score, game over status, and the current and next pieces.
+
+Other modules can follow the game without polling it by registering a listener
+with `TetrisLogic.add_listener`. Listeners are called as `listener(event, data)`
+where `event` is one of the EVENT_* names below and `data` is a dict:
+
+    "reset"      {}
+    "spawn"      {"piece": int, "next": int}
+    "lock"       {"cells": [(x, y, value), ...]}
+    "clear"      {"rows": [y, ...], "values": [row, ...], "lines": int, "score": int}
+    "game_over"  {"score": int}
+    "restore"    {}
+    "garbage"    {"lines": int, "hole": int}
+
+Cleared row indices refer to the board as it was just before the clear. Garbage
+rows are pushed in from the bottom, shifting the whole board up by `lines`.
+
+While `TetrisLogic.replaying` is set (versus rollback re-running ticks that were
+already shown), events only reach the listeners added with `replay=True`; the
+others are told about the outcome with a single "restore" afterwards.
+
+The board also carries a filled-cell count per row (`TetrisLogic.row_counts`)
+and an incrementally maintained Zobrist hash (`TetrisLogic.board_hash`), and `snapshot()` / `restore()` save and load the
+whole game state as a small immutable `GameSnapshot`, for search, undo and
+replay seeking.
+
+The board size is a per-game parameter (`TetrisLogic(width=..., height=...)`),
+defaulting to GRID_WIDTH x GRID_HEIGHT, so large challenge boards such as
+40x80 run on the same code.
 """
 import random
 from settings import *
 
+# Event names passed to listeners.
+EVENT_RESET = "reset"
+EVENT_SPAWN = "spawn"
+EVENT_LOCK = "lock"
+EVENT_CLEAR = "clear"
+EVENT_GAME_OVER = "game_over"
+EVENT_RESTORE = "restore"
+EVENT_GARBAGE = "garbage"
+
 # Define the seven standard tetromino shapes (I, O, T, S, Z, J, L).
 # Each number represents a filled block in the piece's grid.
 SHAPES = [
@@ -21,6 +58,114 @@ SHAPES = [
     [[0, 0, 1], [1, 1, 1]]   # L shape
 ]
 
+# The board value of garbage rows received in versus mode (pieces use 1..len(SHAPES)).
+GARBAGE_VALUE = len(SHAPES) + 1
+
+# All four clockwise rotations of every shape, computed once. ROTATIONS[i][r] is
+# shape i turned r times; rotating a piece just picks the next entry. These
+# matrices are shared, so they must never be modified.
+ROTATIONS = []
+for _shape in SHAPES:
+    _turns = [_shape]
+    for _ in range(3):
+        # Pythonic way to rotate a 2D matrix (list of lists) clockwise.
+        _turns.append([list(row) for row in zip(*_turns[-1][::-1])])
+    ROTATIONS.append(_turns)
+
+# --- Zobrist Hashing ---
+# Every (column, cell value) pair gets a fixed random 64-bit key, and a row's hash
+# is the XOR of the keys of its filled cells. The board hash combines the row
+# hashes with a per-row odd multiplier, so rows that shift down after a line
+# clear only need their position term recomputed. The generator is seeded with
+# a constant so hashes match across processes and runs. Each board size gets
+# its own tables, generated once and shared by every game of that size.
+HASH_MASK = (1 << 64) - 1
+_zobrist_tables = {}
+
+
+def zobrist_tables(width, height):
+    """
+    Returns the Zobrist keys for a board size, generating them on first use.
+
+    Args:
+        width (int): The board width in cells.
+        height (int): The board height in cells.
+
+    Returns:
+        tuple: (cells, rows), where cells[x][value] is a cell key and rows[y] a row multiplier.
+    """
+    tables = _zobrist_tables.get((width, height))
+    if tables is None:
+        rng = random.Random(0x7E7215)
+        cells = [[0] + [rng.getrandbits(64) for _ in range(GARBAGE_VALUE)] for _ in range(width)]
+        rows = [rng.getrandbits(64) | 1 for _ in range(height)]
+        tables = _zobrist_tables[(width, height)] = (cells, rows)
+    return tables
+
+
+ZOBRIST_CELLS, ZOBRIST_ROWS = zobrist_tables(GRID_WIDTH, GRID_HEIGHT)
+
+
+def row_term(row_hash, y, rows=ZOBRIST_ROWS):
+    """Returns the contribution of a row with hash `row_hash` at height `y` to the board hash."""
+    return (row_hash * rows[y]) & HASH_MASK
+
+
+class GameSnapshot:
+    """
+    A compact, immutable copy of a game's state.
+
+    Only the non-empty bottom part of the board is stored, packed one byte per
+    cell, so a typical mid-game snapshot holds a few dozen bytes of cells plus a
+    handful of integers. Snapshots hash by a precomputed key derived from the
+    Zobrist board hash and the piece state. Equal keys do not prove equal states,
+    so equality also compares every field, the packed cells included.
+    """
+    __slots__ = ("key", "board_hash", "top", "cells", "score", "game_over", "piece_idx", "rotation",
+                 "piece_x", "piece_y", "next_piece_idx", "rng_state", "garbage_state")
+
+    def __init__(self, logic):
+        """
+        Captures the state of a game.
+
+        Args:
+            logic (TetrisLogic): The game to capture.
+        """
+        board = logic.board
+        row_counts = logic.row_counts
+        top = 0
+        while top < len(board) and not row_counts[top]:
+            top += 1
+        assign = object.__setattr__
+        assign(self, "top", top)
+        assign(self, "cells", b"".join(map(bytes, board[top:])))
+        assign(self, "board_hash", logic.board_hash)
+        assign(self, "score", logic.score)
+        assign(self, "game_over", logic.game_over)
+        assign(self, "piece_idx", logic.current_color_idx)
+        assign(self, "rotation", logic.rotation)
+        assign(self, "piece_x", logic.piece_x)
+        assign(self, "piece_y", logic.piece_y)
+        assign(self, "next_piece_idx", logic.next_piece_idx)
+        assign(self, "rng_state", logic.rng_state)
+        assign(self, "garbage_state", logic.garbage_state)
+        assign(self, "key", hash((logic.board_hash, logic.score, logic.game_over, logic.current_color_idx,
+                                logic.rotation, logic.piece_x, logic.piece_y, logic.next_piece_idx,
+                                logic.rng_state, logic.garbage_state)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameSnapshot is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, GameSnapshot):
+            return NotImplemented
+        # Different keys settle most comparisons at once; equal keys may still collide.
+        return self.key == other.key and all(getattr(self, name) == getattr(other, name)
+                                             for name in GameSnapshot.__slots__[1:])
+
+    def __hash__(self):
+        return self.key
+
 class TetrisLogic:
     """
     Manages the state and mechanics of the Tetris game.
@@ -28,23 +173,121 @@ class TetrisLogic:
     This class encapsulates the game board, the current and next pieces,
     player score, and all the core functions required to play the game.
     """
-    def __init__(self):
-        """Initializes the Tetris game logic."""
+    def __init__(self, seed=None, width=GRID_WIDTH, height=GRID_HEIGHT):
+        """
+        Initializes the Tetris game logic.
+
+        Args:
+            seed (int, optional): Seeds the piece sequence, so two games with the
+                                  same seed deal the same pieces. Defaults to a random seed.
+            width (int, optional): The board width in cells. Defaults to GRID_WIDTH.
+            height (int, optional): The board height in cells. Defaults to GRID_HEIGHT.
+        """
         # This reference is needed for the main loop to render the next piece.
         self.SHAPES = SHAPES 
+        self.width = width
+        self.height = height
+        self.zobrist_cells, self.zobrist_rows = zobrist_tables(width, height)
+        # Callables notified of game events; they survive `reset()`.
+        self.listeners = []
+        # The listeners that are also notified while `replaying`.
+        self.replay_listeners = []
+        # Set while ticks that were already played are re-run (see the module docstring).
+        self.replaying = False
+        self.seed_pieces(seed)
         self.reset()
 
-    def reset(self):
-        """Resets the game to its initial state."""
-        self.board = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+    def seed_pieces(self, seed=None):
+        """
+        Seeds the piece generator.
+
+        The generator is a 32-bit xorshift whose whole state is one integer, so
+        many games can run side by side cheaply and a game's state is trivial
+        to copy. Games with the same seed deal the same pieces. A second
+        generator, derived from the same seed, picks the holes of garbage rows
+        so that garbage never shifts the piece sequence.
+
+        Args:
+            seed (int, optional): The seed. Defaults to a random one.
+        """
+        if seed is None:
+            seed = random.getrandbits(32)
+        # xorshift has a single fixed point at 0, so a zero seed is remapped.
+        self.rng_state = (seed & 0xFFFFFFFF) or 0x9E3779B9
+        self.garbage_state = ((seed ^ 0x5BD1E995) & 0xFFFFFFFF) or 0x9E3779B9
+
+    @staticmethod
+    def xorshift(x):
+        """Advances a 32-bit xorshift state by one step and returns the new state."""
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        return x
+
+    def random_piece(self):
+        """
+        Draws the next random piece index from the seeded generator.
+
+        Returns:
+            int: An index into SHAPES.
+        """
+        self.rng_state = self.xorshift(self.rng_state)
+        return self.rng_state % len(SHAPES)
+
+    def add_listener(self, listener, replay=False):
+        """
+        Registers a callable to be notified of game events.
+
+        Args:
+            listener (callable): Called as `listener(event, data)`; see the module docstring.
+            replay (bool, optional): Also notify it while `replaying`, for bookkeeping
+                                     that the re-run ticks depend on. Defaults to False.
+        """
+        self.listeners.append(listener)
+        if replay:
+            self.replay_listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a listener added with `add_listener`."""
+        self.listeners.remove(listener)
+        if listener in self.replay_listeners:
+            self.replay_listeners.remove(listener)
+
+    def emit(self, event, data):
+        """Sends an event to every registered listener (only the replay listeners while `replaying`)."""
+        for listener in self.replay_listeners if self.replaying else self.listeners:
+            listener(event, data)
+
+    def reset(self, seed=None):
+        """
+        Resets the game to its initial state.
+
+        Args:
+            seed (int, optional): Reseeds the piece sequence. By default the
+                                  generator simply continues, so consecutive games differ.
+        """
+        if seed is not None:
+            self.seed_pieces(seed)
+        self.board = [[0 for _ in range(self.width)] for _ in range(self.height)]
         self.score = 0
         self.game_over = False
         self.current_piece = None
         self.current_color_idx = 0
         self.piece_x = 0
         self.piece_y = 0
+        # The row the current piece would land on if hard-dropped (the "ghost").
+        self.ghost_y = 0
+        # How many clockwise turns the current piece has made (index into ROTATIONS).
+        self.rotation = 0
+        # Zobrist hash of the board and of each of its rows (see `row_term`).
+        self.board_hash = 0
+        self.row_hashes = [0] * self.height
+        # Filled cells per row; a row is complete when its count reaches the width.
+        self.row_counts = [0] * self.height
         # Pre-select the next piece to be displayed in the UI.
-        self.next_piece_idx = random.randint(0, len(SHAPES) - 1)
+        self.next_piece_idx = self.random_piece()
+        if self.listeners:
+            self.emit(EVENT_RESET, {})
         self.spawn_piece()
 
     def spawn_piece(self):
@@ -57,16 +300,36 @@ class TetrisLogic:
         """
         self.current_piece = SHAPES[self.next_piece_idx]
         self.current_color_idx = self.next_piece_idx
+        self.rotation = 0
         
-        self.next_piece_idx = random.randint(0, len(SHAPES) - 1)
+        self.next_piece_idx = self.random_piece()
         
         # Position the new piece horizontally centered at the top of the board.
-        self.piece_x = GRID_WIDTH // 2 - len(self.current_piece[0]) // 2
+        self.piece_x = self.width // 2 - len(self.current_piece[0]) // 2
         self.piece_y = 0
         
         # If there's no room for the new piece, the game is over.
         if self.check_collision(self.current_piece, self.piece_x, self.piece_y):
             self.game_over = True
+        self.update_ghost()
+
+        if self.listeners:
+            self.emit(EVENT_SPAWN, {"piece": self.current_color_idx, "next": self.next_piece_idx})
+            if self.game_over:
+                self.emit(EVENT_GAME_OVER, {"score": self.score})
+
+    def update_ghost(self):
+        """
+        Recomputes the landing row of the current piece (`ghost_y`).
+
+        The landing row only depends on the piece's shape, its column and the
+        board, so this is called when the piece spawns, moves sideways or rotates,
+        never once per frame. Moving down keeps the same landing row.
+        """
+        y = self.piece_y
+        while not self.check_collision(self.current_piece, self.piece_x, y + 1):
+            y += 1
+        self.ghost_y = y
 
     def check_collision(self, shape, off_x, off_y):
         """
@@ -85,7 +348,7 @@ class TetrisLogic:
             for cx, val in enumerate(row):
                 if val: # Only check filled parts of the piece grid.
                     # Check for collision with the walls or the floor.
-                    if off_x + cx < 0 or off_x + cx >= GRID_WIDTH or off_y + cy >= GRID_HEIGHT:
+                    if off_x + cx < 0 or off_x + cx >= self.width or off_y + cy >= self.height:
                         return True
                     # Check for collision with other pieces already on the board.
                     # Ensure piece is within the board's vertical bounds before checking array index.
@@ -101,10 +364,13 @@ class TetrisLogic:
         anything.
         """
         if self.game_over: return
-        # Pythonic way to rotate a 2D matrix (list of lists) clockwise.
-        rotated = [list(row) for row in zip(*self.current_piece[::-1])]
+        # The rotations are precomputed, so turning just picks the next one.
+        rotation = (self.rotation + 1) % 4
+        rotated = ROTATIONS[self.current_color_idx][rotation]
         if not self.check_collision(rotated, self.piece_x, self.piece_y):
             self.current_piece = rotated
+            self.rotation = rotation
+            self.update_ghost()
 
     def move(self, dx, dy):
         """
@@ -121,6 +387,8 @@ class TetrisLogic:
         if not self.check_collision(self.current_piece, self.piece_x + dx, self.piece_y + dy):
             self.piece_x += dx
             self.piece_y += dy
+            if dx:
+                self.update_ghost()
             return True
         return False
 
@@ -129,38 +397,193 @@ class TetrisLogic:
         Locks the current piece into place on the board.
         
         This transfers the piece's shape from a temporary state to being part
-        of the main board grid. It then checks for completed lines and spawns
-        the next piece.
+        of the main board grid. It then checks the rows the piece touched for
+        completed lines and spawns the next piece.
         """
+        cells = []
+        rows = []
+        value = self.current_color_idx + 1
         for cy, row in enumerate(self.current_piece):
+            y = self.piece_y + cy
+            if any(row):
+                rows.append(y)
             for cx, val in enumerate(row):
                 if val:
+                    x = self.piece_x + cx
                     # The value stored on the board is the color index + 1,
                     # as 0 is reserved for empty cells.
-                    self.board[self.piece_y + cy][self.piece_x + cx] = self.current_color_idx + 1
-        self.clear_lines()
+                    self.board[y][x] = value
+                    self.row_counts[y] += 1
+                    cells.append((x, y, value))
+                    # Update the Zobrist hash of the row and the board incrementally.
+                    old_hash = self.row_hashes[y]
+                    new_hash = old_hash ^ self.zobrist_cells[x][value]
+                    self.row_hashes[y] = new_hash
+                    self.board_hash ^= row_term(old_hash, y, self.zobrist_rows) ^ \
+                        row_term(new_hash, y, self.zobrist_rows)
+        if self.listeners:
+            self.emit(EVENT_LOCK, {"cells": cells})
+        self.clear_lines(rows)
         self.spawn_piece()
 
-    def clear_lines(self):
+    def clear_lines(self, rows=None):
         """
         Checks for and clears any completed horizontal lines on the board.
         
         For each cleared line, the score is increased. The remaining lines
         are shifted down, and new empty lines are added at the top.
+
+        A row is complete when its entry in `row_counts` equals the width, so
+        only the candidate rows are looked at and no cell is scanned. Cleared
+        rows are deleted from the board list in place and the rows above keep
+        their lists; only the new empty rows are allocated.
+
+        Args:
+            rows (list, optional): The rows that may have been completed, e.g.
+                                   the rows a piece was just locked into. Defaults to every row.
         """
-        # Create a new board containing only the rows that are not full.
-        new_board = [row for row in self.board if any(x == 0 for x in row)]
-        
-        # Calculate how many lines were cleared.
-        lines_cleared = GRID_HEIGHT - len(new_board)
-        
-        # Add new empty rows at the top of the board for each line cleared.
-        for _ in range(lines_cleared):
-            new_board.insert(0, [0] * GRID_WIDTH)
-            
-        self.board = new_board
+        width = self.width
+        row_counts = self.row_counts
+        candidates = range(self.height) if rows is None else sorted(rows)
+        cleared_rows = [y for y in candidates if row_counts[y] == width]
+        if not cleared_rows:
+            return
+        lines_cleared = len(cleared_rows)
+
+        # Take out the position terms of every row that moves (all rows down to
+        # the lowest cleared one); rows below it keep their place and their term.
+        row_hashes = self.row_hashes
+        zobrist_rows = self.zobrist_rows
+        lowest = cleared_rows[-1]
+        board_hash = self.board_hash
+        for y in range(lowest + 1):
+            if row_hashes[y]:
+                board_hash ^= (row_hashes[y] * zobrist_rows[y]) & HASH_MASK
+
+        # Delete the cleared rows from the bottom up so the indices stay valid,
+        # then put empty rows on top. Rows keep their row hash when they shift down.
+        board = self.board
+        cleared_values = [board[y] for y in cleared_rows]
+        for y in reversed(cleared_rows):
+            del board[y]
+            del row_hashes[y]
+            del row_counts[y]
+        board[0:0] = [[0] * width for _ in range(lines_cleared)]
+        row_hashes[0:0] = [0] * lines_cleared
+        row_counts[0:0] = [0] * lines_cleared
+
+        for y in range(lines_cleared, lowest + 1):
+            if row_hashes[y]:
+                board_hash ^= (row_hashes[y] * zobrist_rows[y]) & HASH_MASK
+        self.board_hash = board_hash
         
         # Update the score based on the number of cleared lines.
         # A simple scoring model: 100 points per line.
-        if lines_cleared > 0:
-            self.score += lines_cleared * 100
\ No newline at end of file
+        self.score += lines_cleared * 100
+        if self.listeners:
+            self.emit(EVENT_CLEAR, {"rows": cleared_rows, "values": cleared_values,
+                                    "lines": lines_cleared, "score": self.score})
+
+    def rehash(self):
+        """
+        Combines the row hashes into a board hash, after rows have moved.
+
+        Returns:
+            int: The Zobrist hash of the board.
+        """
+        rows = self.zobrist_rows
+        board_hash = 0
+        for y, row_hash in enumerate(self.row_hashes):
+            if row_hash:
+                board_hash ^= (row_hash * rows[y]) & HASH_MASK
+        return board_hash
+
+    def snapshot(self):
+        """
+        Captures the current game state.
+
+        Returns:
+            GameSnapshot: An immutable copy that `restore()` can return to.
+        """
+        return GameSnapshot(self)
+
+    def restore(self, snap):
+        """
+        Returns the game to a state captured with `snapshot()`.
+
+        Only the stored (non-empty) rows are unpacked and re-hashed, so the cost
+        grows with the height of the stack (not constant); the piece is looked up
+        in the precomputed rotations instead of being rotated again.
+
+        Args:
+            snap (GameSnapshot): The state to restore.
+        """
+        width = self.width
+        cells = snap.cells
+        self.board = [[0] * width for _ in range(snap.top)] + \
+                     [list(cells[i:i + width]) for i in range(0, len(cells), width)]
+        self.row_hashes = [0] * snap.top
+        self.row_counts = [0] * snap.top
+        for row in self.board[snap.top:]:
+            row_hash = 0
+            for x, value in enumerate(row):
+                if value:
+                    row_hash ^= self.zobrist_cells[x][value]
+            self.row_hashes.append(row_hash)
+            self.row_counts.append(width - row.count(0))
+        self.board_hash = snap.board_hash
+        self.score = snap.score
+        self.game_over = snap.game_over
+        self.current_color_idx = snap.piece_idx
+        self.rotation = snap.rotation
+        self.current_piece = ROTATIONS[snap.piece_idx][snap.rotation]
+        self.piece_x = snap.piece_x
+        self.piece_y = snap.piece_y
+        self.next_piece_idx = snap.next_piece_idx
+        self.rng_state = snap.rng_state
+        self.garbage_state = snap.garbage_state
+        self.update_ghost()
+        if self.listeners:
+            self.emit(EVENT_RESTORE, {})
+
+    def add_garbage(self, lines, hole=None):
+        """
+        Pushes garbage rows in from the bottom of the board (versus mode).
+
+        Every garbage row is full except for one shared hole column. The board
+        shifts up by `lines`; if that pushes blocks off the top, or into the
+        falling piece, the game is over.
+
+        Args:
+            lines (int): How many garbage rows to add.
+            hole (int, optional): The empty column. Defaults to one drawn from the
+                                  game's garbage generator, so peers agree on it.
+        """
+        if self.game_over or lines <= 0:
+            return
+        lines = min(lines, self.height)
+        if hole is None:
+            self.garbage_state = self.xorshift(self.garbage_state)
+            hole = self.garbage_state % self.width
+
+        topped_out = any(self.row_counts[:lines])
+        garbage_row = [GARBAGE_VALUE] * self.width
+        garbage_row[hole] = 0
+        garbage_hash = 0
+        for x, value in enumerate(garbage_row):
+            if value:
+                garbage_hash ^= self.zobrist_cells[x][value]
+        self.board = self.board[lines:] + [list(garbage_row) for _ in range(lines)]
+        # Every surviving row moves up, so all position terms are recomputed.
+        self.row_hashes = self.row_hashes[lines:] + [garbage_hash] * lines
+        self.row_counts = self.row_counts[lines:] + [self.width - 1] * lines
+        self.board_hash = self.rehash()
+
+        if self.listeners:
+            self.emit(EVENT_GARBAGE, {"lines": lines, "hole": hole})
+        if topped_out or self.check_collision(self.current_piece, self.piece_x, self.piece_y):
+            self.game_over = True
+            if self.listeners:
+                self.emit(EVENT_GAME_OVER, {"score": self.score})
+        else:
+            self.update_ghost()
@@ -5,14 +5,32 @@ The main entry point and application class for the Tetris: Neon Arcade game.
 This module initializes Pygame and all other game modules (UI, Logic, Network, Discord).
 It contains the main application class, `MainApp`, which manages the game's state machine,
 the main game loop, event handling, and the rendering pipeline.
+
+Startup is staged so the window appears as early as possible: the window is opened
+first, then fonts and game modules are loaded, and the slow optional work (the
+Discord handshake and the leaderboard download) runs on background threads while
+the first frames are already being drawn.
 """
+import time
+_PROCESS_START = time.perf_counter()
+
+import os
 import pygame
+import random
 import sys
-from discord_manager import DiscordHandler
+import threading
 from settings import *
-from ui import ArcadeUI
+from ui import ArcadeUI, BoardLayer, fit_block_size
+from effects import EffectsManager
+from features import FeatureTracker
 from logic import TetrisLogic
 from network import NetworkManager
+from recorder import Replay
+from store import STORE, DOC_BINDINGS, DOC_REPLAYS
+from telemetry import TELEMETRY, log
+from input_manager import (InputManager, restrict_event_queue, bindings_to_names, bindings_from_names,
+                           KEY_BINDINGS, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_SOFT_DROP,
+                           ACTION_HARD_DROP)
 
 class DummySound:
     """A dummy class to prevent crashes when sound files are not available."""
@@ -24,25 +42,86 @@ class MainApp:
     """
     The main application class. Manages the game window, states, loop, and modules.
     """
-    def __init__(self):
+    def __init__(self, offline=False, board_size=None):
         """
         Initializes the game window, clocks, and all major components.
         Sets up the initial game state.
+
+        Args:
+            offline (bool, optional): Skips Discord, the leaderboard download and the
+                                      optional servers, for headless uses such as
+                                      rendering replays. Defaults to False.
+            board_size (tuple, optional): The board (width, height) in cells. Defaults to
+                                          the `--board WxH` option, or GRID_WIDTH x GRID_HEIGHT.
         """
-        pygame.init()
+        # (stage name, seconds since process start) pairs for the startup report.
+        self.startup_marks = [("imports", time.perf_counter() - _PROCESS_START)]
+
+        # --- Stage 1: Window ---
+        # Only the subsystems the game actually uses are initialized. `pygame.init()`
+        # would also open the audio device and scan for joysticks, which is slow on
+        # some machines and unused here (sounds are not implemented yet).
+        pygame.display.init()
         # The screen is the actual window, which can be resized.
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
+        pygame.display.set_caption("TETRIS: NEON ARCADE")
+        restrict_event_queue()
+        # Show the background color right away so the window never appears blank/white.
+        self.screen.fill(COLOR_BG_DARK)
+        pygame.display.flip()
         # The canvas is a fixed-size surface where all game elements are drawn.
         # This canvas is then scaled to fit the window, preserving the aspect ratio.
         self.canvas = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        
-        pygame.display.set_caption("TETRIS: NEON ARCADE")
         self.clock = pygame.time.Clock()
-        
-        # Initialize all game components
+        # The first tick also starts SDL's timer, which `pygame.init()` used to do
+        # and which `pygame.time.get_ticks()` relies on.
+        self.clock.tick()
+        self.mark_startup("window")
+
+        # --- Stage 2: Fonts and UI ---
+        pygame.font.init()
         self.ui = ArcadeUI(self.canvas)
-        self.logic = TetrisLogic()
+        self.mark_startup("fonts")
+
+        # --- Stage 3: Game modules ---
+        # `--board 40x80` plays on a larger board; the blocks shrink to fit the canvas.
+        if board_size is None and "--board" in sys.argv:
+            index = sys.argv.index("--board") + 1
+            if index < len(sys.argv):
+                board_size = tuple(int(n) for n in sys.argv[index].lower().split("x"))
+        width, height = board_size or (GRID_WIDTH, GRID_HEIGHT)
+        self.logic = TetrisLogic(width=width, height=height)
+        # The board gets the room of the standard layout: the canvas minus the sidebar and margins.
+        self.block_size = fit_block_size(width, height, SCREEN_WIDTH - 350, SCREEN_HEIGHT - 100)
+        self.game_area_width = width * self.block_size
+        self.game_area_height = height * self.block_size
+        # Cached drawings of locked cells, one per game drawn (see `BoardLayer`).
+        self.board_layers = {}
+        # Line-clear and lock effects follow the game through its events.
+        self.effects = EffectsManager(self.block_size, width, height)
+        self.logic.add_listener(self.effects.on_logic_event)
+        # The board features of the player's game, updated on every lock for analytics.
+        self.features = FeatureTracker(self.logic)
+        if offline:
+            # Headless runs keep the console messages but write no telemetry file.
+            TELEMETRY.enabled = False
+        else:
+            # Game events go to the telemetry log (batched, off the frame path).
+            self.logic.add_listener(TELEMETRY.on_logic_event)
         self.network = NetworkManager()
+        # Key bindings live in the local store; the defaults are saved there on
+        # first run so players can edit them.
+        saved_bindings = STORE.get(DOC_BINDINGS)
+        if saved_bindings is None and not offline:
+            STORE.put(DOC_BINDINGS, bindings_to_names(KEY_BINDINGS))
+        self.input = InputManager(bindings=bindings_from_names(saved_bindings) if saved_bindings else KEY_BINDINGS)
+        # Read the replays index now, so saving a replay at game over never waits on the disk.
+        STORE.get(DOC_REPLAYS)
+        # Simulation clock (ms) of the last fixed step, and time since the last gravity drop.
+        self.sim_time = 0
+        self.gravity_elapsed = 0
+        # The attract-mode bot game, created the first time the CONTROLS screen is shown.
+        self.demo = None
         
         # Use the dummy sound class to avoid errors if sounds are not implemented.
         self.sound = DummySound() 
@@ -51,21 +130,119 @@ class MainApp:
         # Replace with your actual Discord App ID and GitHub repo URL.
         YOUR_APP_ID = "1456684566101102592" 
         YOUR_GITHUB = "https://github.com/AliReza/Tetris/releases"
+        # Importing 'discord_manager' is cheap; 'pypresence' itself is only
+        # imported by `DiscordHandler.connect()` on the background thread.
+        from discord_manager import DiscordHandler
         self.discord = DiscordHandler(YOUR_APP_ID, YOUR_GITHUB)
-        self.discord.update_presence("In Menu", "Waiting to start...")
 
         # --- Game State Machine ---
         # The game starts in the 'LOGIN' state if no user is saved,
         # otherwise it jumps straight to the 'CONTROLS' screen.
         if self.network.username:
-            print(f"Auto-login successful: {self.network.username}")
+            log("login", echo=f"Auto-login successful: {self.network.username}", auto=True)
             self.state = "CONTROLS"
             self.input_text = self.network.username
         else:
             self.state = "LOGIN" 
             self.input_text = "PLAYER 1"
         
-        # Fetch the leaderboard from the server at startup.
+        # --- Replays and Video Recording ---
+        # The current game's seed and inputs, saved when it ends.
+        self.replay = None
+        # The live video recording, toggled with F9 or started with `--record PATH`.
+        self.recorder = None
+        if "--record" in sys.argv and not offline:
+            index = sys.argv.index("--record") + 1
+            self.toggle_recording(sys.argv[index] if index < len(sys.argv) else None)
+
+        # --- Optional Spectator Broadcast ---
+        self.spectator = None
+        if (SPECTATOR_ENABLED or "--spectate" in sys.argv) and not offline:
+            from spectator import SpectatorServer, SpectatorPublisher
+            server = SpectatorServer()
+            server.start()
+            self.spectator = SpectatorPublisher(server, self.logic, self.network.username or "GUEST")
+
+        # --- Optional Versus Match ---
+        # `--versus HOST:PORT[:MATCH]` plays against whoever joins the same match on that relay.
+        self.relay = None
+        self.session = None
+        self.versus_result = ""
+        # Inputs that arrived while waiting for the match to start (see `begin_versus`).
+        self.early_inputs = []
+        if "--versus" in sys.argv and not offline:
+            from relay import RelayClient
+            index = sys.argv.index("--versus") + 1
+            parts = sys.argv[index].split(":") if index < len(sys.argv) else []
+            self.relay = RelayClient(parts[0] if parts and parts[0] else VERSUS_HOST,
+                                     int(parts[1]) if len(parts) > 1 else VERSUS_PORT,
+                                     int(parts[2]) if len(parts) > 2 else 0)
+
+        # The last downloaded leaderboard (or a placeholder) until the background fetch below completes.
+        self.leaderboard = self.network.cached_leaderboard()
+        self.mark_startup("modules")
+
+        # --- Stage 4: Slow optional work, off the main thread ---
+        if not offline:
+            self.run_in_background("discord", self.connect_discord)
+            self.run_in_background("leaderboard", self.fetch_initial_leaderboard)
+
+    def mark_startup(self, stage):
+        """
+        Records the time at which a startup stage finished.
+
+        Args:
+            stage (str): A short name for the stage that just completed.
+        """
+        self.startup_marks.append((stage, time.perf_counter() - _PROCESS_START))
+
+    def report_startup_times(self):
+        """Prints how long each startup stage took, up to the first presented frame."""
+        parts = []
+        previous = 0.0
+        for stage, elapsed in self.startup_marks:
+            parts.append(f"{stage} {(elapsed - previous) * 1000:.0f}ms")
+            previous = elapsed
+        log("startup", echo=f"[STARTUP] {' | '.join(parts)} | total {previous * 1000:.0f}ms",
+            stages={stage: round(elapsed * 1000) for stage, elapsed in self.startup_marks})
+
+    def run_in_background(self, name, target):
+        """
+        Runs a slow task (network, Discord) on a daemon thread and reports how long it took.
+
+        Args:
+            name (str): The task name used in the report.
+            target (callable): The function to run.
+        """
+        def task():
+            started = time.perf_counter()
+            target()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            log("background_task", echo=f"[BACKGROUND] {name} finished in {elapsed_ms:.0f}ms",
+                task=name, ms=round(elapsed_ms))
+        threading.Thread(target=task, name=f"background-{name}", daemon=True).start()
+
+    def connect_discord(self):
+        """Connects to Discord and publishes the initial menu presence."""
+        if self.discord.connect():
+            self.discord.update_presence("In Menu", "Waiting to start...")
+
+    def fetch_initial_leaderboard(self):
+        """Fetches the leaderboard at startup, retrying once if the first attempt fails."""
+        for _ in range(2):
+            leaderboard = self.network.get_leaderboard()
+            self.leaderboard = leaderboard
+            if leaderboard and leaderboard[0]["name"] != "Loading...":
+                break
+
+    def submit_final_score(self, score):
+        """
+        Submits a finished game's score, then refreshes the leaderboard.
+
+        Args:
+            score (int): The final score.
+        """
+        self.network.submit_score(score)
         self.leaderboard = self.network.get_leaderboard()
 
     def run(self):
@@ -75,10 +252,7 @@ class MainApp:
         This loop continuously handles input, updates game state, and draws the screen
         until the user quits.
         """
-        # A one-time forceful fetch if the initial one in __init__ failed.
-        if not self.leaderboard or len(self.leaderboard) == 0:
-             self.leaderboard = self.network.get_leaderboard()
-
+        first_frame = True
         while True:
             self.handle_input()
             self.update()
@@ -89,16 +263,55 @@ class MainApp:
             
             # 2. Scale the canvas to fit the resizable window while preserving aspect ratio.
             self.render_to_screen_preserve_aspect()
+
+            if self.recorder:
+                self.recorder.capture(self.canvas)
+
+            if first_frame:
+                self.mark_startup("first frame")
+                self.report_startup_times()
+                first_frame = False
             
             self.clock.tick(FPS)
 
+    def start_game(self):
+        """Starts a fresh game and resets the input buffer and simulation clock."""
+        if self.relay:
+            # Versus games start when the relay has found an opponent.
+            self.end_versus()
+            self.relay.close()
+            self.relay.start_info = None
+            self.relay.players_left = []
+            self.early_inputs = []
+            # Connecting happens in the background; WAITING gives up if it fails.
+            self.relay.connect()
+            self.state = "WAITING"
+            return
+        # An explicit seed makes the game reproducible from its replay.
+        seed = random.getrandbits(32)
+        self.logic.reset(seed)
+        self.replay = Replay(seed, board_size=(self.logic.width, self.logic.height))
+        self.state = "PLAYING"
+        self.input.reset()
+        self.sim_time = pygame.time.get_ticks()
+        self.gravity_elapsed = 0
+
     def handle_input(self):
         """Processes all user input from Pygame events based on the current game state."""
         events = pygame.event.get()
+        # All events read in one batch share a timestamp; gameplay keys become
+        # queued actions that the fixed-step simulation consumes in `update`.
+        now = pygame.time.get_ticks()
         for event in events:
             if event.type == pygame.QUIT:
+                if self.recorder:
+                    self.toggle_recording()
                 pygame.quit()
                 sys.exit()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                self.toggle_recording()
+                continue
             
             # --- LOGIN STATE ---
             if self.state == "LOGIN":
@@ -107,6 +320,8 @@ class MainApp:
                         # On Enter, register the user and move to the controls screen.
                         if self.input_text:
                             self.network.register_user(self.input_text)
+                            if self.spectator:
+                                self.spectator.player_name = self.network.username or "GUEST"
                             self.state = "CONTROLS"
                             self.sound.play('level') 
                     elif event.key == pygame.K_BACKSPACE:
@@ -121,80 +336,249 @@ class MainApp:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_RETURN:
                         # On Enter, start the game.
-                        self.state = "PLAYING"
-                        self.logic.reset()
+                        self.start_game()
                         self.sound.play('level')
 
             # --- PLAYING STATE ---
             elif self.state == "PLAYING":
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT: 
-                        if self.logic.move(-1, 0): self.sound.play('move')
-                    
-                    elif event.key == pygame.K_RIGHT: 
-                        if self.logic.move(1, 0): self.sound.play('move')
-                    
-                    elif event.key == pygame.K_UP: 
-                        self.logic.rotate()
-                        self.sound.play('rotate')
-                    
-                    elif event.key == pygame.K_DOWN: # Soft drop
-                        if self.logic.move(0, 1): self.sound.play('move')
-                    
-                    elif event.key == pygame.K_SPACE: # Hard drop
-                        while self.logic.move(0, 1): pass # Move down until it collides
-                        self.logic.lock_piece()
-                        self.sound.play('drop')
-                        
-                        # Update Discord presence after a significant action.
-                        current_name = self.network.username if self.network.username else "Guest"
-                        self.discord.update_presence(f"Score: {self.logic.score}", f"Pilot: {current_name}")
-
-                    elif event.key == pygame.K_p:
-                        self.state = "PAUSED"
-                        self.discord.update_presence("Paused", "Taking a break")
+                if self.input.process_event(event, now):
+                    continue
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_p and not self.session:
+                    self.state = "PAUSED"
+                    self.discord.update_presence("Paused", "Taking a break")
+
+            # --- WAITING FOR A VERSUS OPPONENT ---
+            elif self.state == "WAITING":
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_q:
+                    self.relay.close()
+                    self.state = "CONTROLS"
 
             # --- PAUSED / GAMEOVER STATES ---
             elif self.state in ["PAUSED", "GAMEOVER"]:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r: # Restart
-                        self.logic.reset()
-                        self.state = "PLAYING"
+                        self.start_game()
                         self.sound.play('level')
                         current_name = self.network.username if self.network.username else "Guest"
                         self.discord.update_presence("Score: 0", f"Pilot: {current_name}")
                         
                     elif event.key == pygame.K_q: # Quit to menu
+                        # A finished versus match stops showing the rival's board.
+                        self.end_versus()
                         self.state = "LOGIN"
 
     def update(self):
         """Updates game logic and animations that happen every frame."""
         self.ui.update_animation() 
+        # get_time() is the length of the previous frame in milliseconds; a long
+        # stall is capped so effects don't jump straight to their end.
+        self.effects.update(min(self.clock.get_time(), 100) / 1000)
         
-        if self.state == "PLAYING":
+        if self.spectator:
+            self.spectator.poll()
+
+        if self.state == "CONTROLS":
+            if self.demo is None:
+                from bot import DemoPlayer
+                # The demo keeps the standard board even under `--board`: the bot plans
+                # each piece on the frame path, and a large board costs it tens of ms.
+                self.demo = DemoPlayer()
+            self.demo.update()
+
+        if self.state == "WAITING":
+            # An opponent's first inputs can arrive in the same read as START; they are kept.
+            self.early_inputs += self.relay.poll()
+            if self.relay.start_info:
+                self.begin_versus(self.early_inputs)
+                self.early_inputs = []
+            elif not self.relay.connected and not self.relay.connecting:
+                self.state = "CONTROLS"
+
+        if self.state == "PLAYING" and self.session:
+            self.update_versus()
+        elif self.state == "PLAYING":
             if self.logic.game_over:
                 self.sound.play('gameover')
-                self.network.submit_score(self.logic.score)
-                self.leaderboard = self.network.get_leaderboard() 
-                
+                # The HTTP calls run in the background so the game over screen appears at once.
+                score = self.logic.score
+                self.run_in_background("submit_score", lambda: self.submit_final_score(score))
+
                 self.discord.update_presence("GAME OVER", f"Final Score: {self.logic.score}")
+                # The shape of the final board, for post-game analytics.
+                log("final_board", score=self.logic.score, **self.features.features())
+                if self.replay:
+                    self.save_replay()
                 
                 self.state = "GAMEOVER"
                 return # Exit early to prevent piece from moving after game over.
 
-            # --- Automatic Piece Gravity ---
-            # The piece falls faster if the down arrow is held.
-            speed = 50 if pygame.key.get_pressed()[pygame.K_DOWN] else 500
-            
-            # Using a time-based tick for consistent fall speed regardless of FPS.
-            if pygame.time.get_ticks() % speed < 17: 
-                 if not self.logic.move(0, 1):
-                     self.logic.lock_piece()
-                     self.sound.play('drop')
-                     
-                     # Update Discord when a piece locks and score might change.
-                     current_name = self.network.username if self.network.username else "Guest"
-                     self.discord.update_presence(f"Score: {self.logic.score}", f"Pilot: {current_name}")
+            # --- Fixed-Step Simulation ---
+            # Run as many fixed steps as real time allows; each step applies the
+            # input actions that were due within it, then gravity.
+            now = pygame.time.get_ticks()
+            if now - self.sim_time > MAX_CATCH_UP_MS:
+                # After a long stall, skip ahead instead of replaying it all at once.
+                self.sim_time = now - MAX_CATCH_UP_MS
+            self.input.poll(now)
+            while self.sim_time + SIM_TICK_MS <= now and not self.logic.game_over:
+                self.sim_time += SIM_TICK_MS
+                actions = self.input.pop_actions(self.sim_time)
+                if self.replay:
+                    self.replay.record(actions)
+                self.step_simulation(actions)
+
+    def save_replay(self):
+        """
+        Saves the finished game's replay in the local store and adds it to the replays index.
+        Both files are written in the background and the index was read at startup, so the
+        game over screen appears at once. The index lists the newest REPLAY_INDEX_LIMIT
+        replays; older replay files stay on disk.
+        """
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        name = f"replays/{stamp}_{self.logic.score}"
+        # Replays are never read back by the game, so the store does not keep them in memory.
+        STORE.put(name, self.replay.to_dict(), keep=False)
+        entry = {"file": name + ".json", "score": self.logic.score, "seed": self.replay.seed, "time": stamp}
+        index = STORE.get(DOC_REPLAYS, [])[-(REPLAY_INDEX_LIMIT - 1):] + [entry]
+        STORE.put(DOC_REPLAYS, index)
+        log("replay", echo=f"[RECORDER] Replay saved to {STORE.path(name)}", file=entry["file"],
+            score=self.logic.score)
+
+    def toggle_recording(self, path=None):
+        """
+        Starts or stops recording the canvas to a video.
+
+        Args:
+            path (str, optional): The output file when starting. Defaults to a timestamped
+                                  file in the 'recordings' folder of the local data directory.
+        """
+        from recorder import FrameRecorder, open_sink
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+            return
+        if path is None:
+            folder = os.path.join(STORE.directory, "recordings")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}.mp4")
+        size = self.canvas.get_size()
+        self.recorder = FrameRecorder(open_sink(path, size, FPS), size)
+        log("recording", echo=f"[RECORDER] Recording to {path} (F9 to stop).", path=path)
+
+    def begin_versus(self, inputs=()):
+        """
+        Starts the versus match announced by the relay, with this window's game as the local player.
+
+        Args:
+            inputs (list, optional): (player, tick, bits) inputs received before the match
+                                     started, e.g. in the same read as START. Defaults to none.
+        """
+        from versus import VersusSession
+        player, num_players, seed = self.relay.start_info
+        # Every peer must play on the same board size (the same `--board` option).
+        logics = [self.logic if i == player else TetrisLogic(width=self.logic.width, height=self.logic.height)
+                  for i in range(num_players)]
+        self.session = VersusSession(num_players, player, seed, logics=logics)
+        for other, tick, bits in inputs:
+            self.session.receive_input(other, tick, bits)
+        self.state = "PLAYING"
+        self.input.reset()
+        self.sim_time = pygame.time.get_ticks()
+        self.discord.update_presence("Versus", f"{num_players} pilots")
+
+    def end_versus(self):
+        """Forgets the last versus match, so the sidebar no longer shows its rival."""
+        if self.session:
+            self.session.close()
+            self.session = None
+        self.versus_result = ""
+
+    def update_versus(self):
+        """Exchanges inputs with the relay and advances the versus match in fixed steps."""
+        from versus import actions_to_bits
+        session = self.session
+        for player, tick, bits in self.relay.poll():
+            session.receive_input(player, tick, bits)
+        # Late inputs may correct earlier ticks; the result must come from the corrected games.
+        session.synchronize()
+
+        winner = session.winner()
+        if winner is not None or self.relay.players_left or not self.relay.connected:
+            if winner == -1:
+                self.versus_result = "DRAW"
+            elif winner is None or winner == session.local_player:
+                # An opponent who leaves or drops concedes the match.
+                self.versus_result = "YOU WIN"
+            else:
+                self.versus_result = "YOU LOSE"
+            self.relay.close()
+            log("versus_result", result=self.versus_result, score=self.logic.score, ticks=session.tick,
+                rollbacks=session.rollbacks, resimulated=session.resimulated_ticks)
+            self.discord.update_presence(self.versus_result, f"Versus score: {self.logic.score}")
+            self.state = "GAMEOVER"
+            return
+
+        now = pygame.time.get_ticks()
+        if now - self.sim_time > MAX_CATCH_UP_MS:
+            self.sim_time = now - MAX_CATCH_UP_MS
+        self.input.poll(now)
+        # When an opponent's inputs fall too far behind, the match waits for them.
+        while self.sim_time + SIM_TICK_MS <= now and session.can_advance():
+            self.sim_time += SIM_TICK_MS
+            session.step(actions_to_bits(self.input.pop_actions(self.sim_time)))
+        self.relay.send_inputs(session.local_player, session.take_outbox())
+
+    def step_simulation(self, actions):
+        """
+        Advances the game by one fixed timestep.
+
+        Args:
+            actions (list): (action, is_repeat) pairs due within this step.
+        """
+        for action, is_repeat in actions:
+            if self.logic.game_over:
+                return
+
+            if action == ACTION_LEFT:
+                if self.logic.move(-1, 0): self.sound.play('move')
+
+            elif action == ACTION_RIGHT:
+                if self.logic.move(1, 0): self.sound.play('move')
+
+            elif action == ACTION_ROTATE:
+                self.logic.rotate()
+                self.sound.play('rotate')
+
+            elif action == ACTION_SOFT_DROP:
+                if self.logic.move(0, 1):
+                    self.sound.play('move')
+                    self.gravity_elapsed = 0
+                elif is_repeat:
+                    # Holding down on the floor locks the piece, like fast gravity.
+                    self.lock_current_piece()
+
+            elif action == ACTION_HARD_DROP:
+                while self.logic.move(0, 1): pass # Move down until it collides
+                self.lock_current_piece()
+
+        # --- Automatic Piece Gravity ---
+        if self.logic.game_over:
+            return
+        self.gravity_elapsed += SIM_TICK_MS
+        if self.gravity_elapsed >= GRAVITY_MS:
+            self.gravity_elapsed -= GRAVITY_MS
+            if not self.logic.move(0, 1):
+                self.lock_current_piece()
+
+    def lock_current_piece(self):
+        """Locks the falling piece and reports the (possibly) changed score."""
+        self.logic.lock_piece()
+        self.gravity_elapsed = 0
+        self.sound.play('drop')
+
+        # Update Discord when a piece locks and score might change.
+        current_name = self.network.username if self.network.username else "Guest"
+        self.discord.update_presence(f"Score: {self.logic.score}", f"Pilot: {current_name}")
 
     def draw_on_canvas(self):
         """Draws all game components onto the fixed-size canvas."""
@@ -203,27 +587,47 @@ class MainApp:
         # Center the main game area on the canvas
         layout_margin_left = 30
         game_x = layout_margin_left
-        game_y = (SCREEN_HEIGHT - GAME_AREA_HEIGHT) // 2 
+        game_y = (SCREEN_HEIGHT - self.game_area_height) // 2 
+        sidebar_y = game_y
+
+        # Screen shake moves only the game area; the sidebar stays still.
+        shake_x, shake_y = self.effects.shake_offset()
+        game_x += shake_x
+        game_y += shake_y
         
         # Draw the neon border around the game area
-        game_rect = (game_x - 5, game_y - 5, GAME_AREA_WIDTH + 10, GAME_AREA_HEIGHT + 10)
+        game_rect = (game_x - 5, game_y - 5, self.game_area_width + 10, self.game_area_height + 10)
         self.ui.draw_neon_border(game_rect)
-        pygame.draw.rect(self.canvas, (10, 10, 20), (game_x, game_y, GAME_AREA_WIDTH, GAME_AREA_HEIGHT))
 
         # Draw the Tetris grid, locked pieces, and the current piece.
-        self.draw_game_content(game_x, game_y)
+        if self.state == "CONTROLS" and self.demo:
+            # Attract mode: the bot plays behind the "How to Play" screen, its
+            # standard board scaled to fill the game area.
+            demo = self.demo.logic
+            size = fit_block_size(demo.width, demo.height, self.game_area_width, self.game_area_height)
+            self.draw_game_content(game_x + (self.game_area_width - demo.width * size) // 2,
+                                   game_y + (self.game_area_height - demo.height * size) // 2,
+                                   demo, show_piece=True, block_size=size)
+        else:
+            self.draw_game_content(game_x, game_y)
+        self.effects.draw(self.canvas, game_x, game_y)
 
         # --- Sidebar ---
-        sidebar_x = game_x + GAME_AREA_WIDTH + 40
+        sidebar_x = layout_margin_left + self.game_area_width + 40
         current_name = self.network.username if self.network.username else "GUEST"
         
+        rival = None
+        if self.session:
+            rival = next(logic for i, logic in enumerate(self.session.logics) if i != self.session.local_player)
         self.ui.draw_sidebar(
             sidebar_x, 
-            game_y, 
+            sidebar_y, 
             self.logic.score, 
             self.leaderboard, 
             self.logic, # Pass the logic object to access next_piece etc.
-            current_name 
+            current_name,
+            rival,
+            self.game_area_height
         )
 
         # --- Overlays ---
@@ -234,6 +638,10 @@ class MainApp:
             self.ui.draw_overlay_controls()
         elif self.state == "PAUSED":
             self.draw_overlay_message("PAUSED", "PRESS 'R' TO RESUME")
+        elif self.state == "WAITING":
+            self.draw_overlay_message("VERSUS", "WAITING FOR OPPONENT", "PRESS 'Q' TO CANCEL")
+        elif self.state == "GAMEOVER" and self.versus_result:
+            self.draw_overlay_message(self.versus_result, f"SCORE: {self.logic.score}", "PRESS 'R' FOR A REMATCH")
         elif self.state == "GAMEOVER":
             self.draw_overlay_message("GAME OVER", f"SCORE: {self.logic.score}", "PRESS 'R' TO RESTART")
 
@@ -271,30 +679,48 @@ class MainApp:
 
         pygame.display.flip()
 
-    def draw_game_content(self, start_x, start_y):
-        """Draws the Tetris grid, locked pieces, and the active piece."""
-        # Draw the locked pieces on the board.
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                val = self.logic.board[y][x]
-                if val > 0: # val > 0 means it's a colored block.
-                    color_tuple = SHAPE_COLORS[(val-1) % len(SHAPE_COLORS)]
-                    px = start_x + x * BLOCK_SIZE
-                    py = start_y + y * BLOCK_SIZE
-                    self.ui.draw_3d_block(px, py, color_tuple)
-                else: # val == 0 means it's an empty grid cell.
-                    rect = (start_x + x*BLOCK_SIZE, start_y + y*BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
-                    pygame.draw.rect(self.canvas, (20, 20, 40), rect, 1) # Draw grid lines.
+    def draw_game_content(self, start_x, start_y, logic=None, show_piece=None, block_size=None):
+        """
+        Draws the Tetris grid, locked pieces, and the active piece.
+
+        Args:
+            start_x (int): The x-coordinate of the board's top-left corner.
+            start_y (int): The y-coordinate of the board's top-left corner.
+            logic (TetrisLogic, optional): The game to draw. Defaults to the player's game.
+            show_piece (bool, optional): Whether to draw the falling piece. Defaults to
+                                         True only while the player's game is running.
+            block_size (int, optional): The cell size in pixels. Defaults to the player's board's.
+        """
+        if logic is None:
+            logic = self.logic
+        if show_piece is None:
+            show_piece = self.state == "PLAYING"
+        size = block_size or self.block_size
+        # The locked pieces and the grid lines come from the board's cached
+        # layer, which only redraws the rows that changed since the last frame.
+        layer = self.board_layers.get(logic)
+        if layer is None:
+            layer = self.board_layers[logic] = BoardLayer(self.ui, logic, size)
+        self.canvas.blit(layer.update(), (start_x, start_y))
 
         # Draw the currently falling piece if the game is active.
-        if self.logic.current_piece and self.state == "PLAYING":
-            for cy, row in enumerate(self.logic.current_piece):
+        if logic.current_piece and show_piece:
+            # The ghost shows where the piece will land; `ghost_y` is kept up to
+            # date by the logic, so drawing it needs no collision checks.
+            for cy, row in enumerate(logic.current_piece):
+                for cx, val in enumerate(row):
+                    if val:
+                        px = start_x + (logic.piece_x + cx) * size
+                        py = start_y + (logic.ghost_y + cy) * size
+                        self.ui.draw_ghost_block(px, py, logic.current_color_idx, size)
+
+            sprite = layer.sprites[logic.current_color_idx + 1]
+            for cy, row in enumerate(logic.current_piece):
                 for cx, val in enumerate(row):
                     if val:
-                        color_tuple = SHAPE_COLORS[self.logic.current_color_idx]
-                        px = start_x + (self.logic.piece_x + cx) * BLOCK_SIZE
-                        py = start_y + (self.logic.piece_y + cy) * BLOCK_SIZE
-                        self.ui.draw_3d_block(px, py, color_tuple)
+                        px = start_x + (logic.piece_x + cx) * size
+                        py = start_y + (logic.piece_y + cy) * size
+                        self.canvas.blit(sprite, (px, py))
 
     def draw_overlay_login(self):
         """Draws the user login/creation screen."""
@@ -4,62 +4,78 @@ Manages all network interactions for the game.
 
 This module handles communication with the backend server for features like
 user registration, score submission, and fetching the online leaderboard.
-It also manages local storage of user credentials for auto-login.
+It also keeps the user's credentials for auto-login and the last leaderboard
+that was downloaded in the local store (see store.py), whose writes happen in
+the background so logging in never waits on the disk.
+
+`requests` is imported inside the methods that use it: importing it pulls in
+urllib3, ssl and charset detection, which noticeably delays the first frame
+while the game only needs it once the player logs in or the leaderboard loads.
+
+Diagnostics and request latencies go to the telemetry log (see telemetry.py).
 """
-import requests
 import json
 import os
 import sys
+import time
 from settings import API_URL
+from store import STORE, DOC_CREDENTIALS, DOC_LEADERBOARD
+from telemetry import log, timed
 
 class NetworkManager:
     """
     Handles API requests and local user credential management.
     """
-    def __init__(self):
+    def __init__(self, store=STORE):
         """
         Initializes the NetworkManager and loads any saved user credentials.
+
+        Args:
+            store (LocalStore, optional): Where credentials and the leaderboard cache are kept.
+                                          Defaults to the shared store.
         """
         self.username = None
+        self.store = store
         
-        # Determine the correct path for the credential file, even when run from an executable.
+        # Older versions saved the credentials next to the game; they are moved into the store once.
         # sys.argv[0] is the path to the script or executable.
         base_path = os.path.dirname(os.path.abspath(sys.argv[0]))
-        self.credential_file = os.path.join(base_path, "user_credential.json")
+        self.legacy_credential_file = os.path.join(base_path, "user_credential.json")
         
         self.load_local_credentials()
 
     def load_local_credentials(self):
         """
-        Loads the username from a local JSON file if it exists.
+        Loads the saved username from the local store, if there is one.
         This allows the user to be automatically logged in on subsequent plays.
         """
-        if os.path.exists(self.credential_file):
+        data = self.store.get(DOC_CREDENTIALS)
+        if data is None and os.path.exists(self.legacy_credential_file):
             try:
-                with open(self.credential_file, "r") as f:
+                with open(self.legacy_credential_file, "r") as f:
                     data = json.load(f)
-                    saved_name = data.get("username")
-                    if saved_name:
-                        self.username = saved_name
-                        print(f"[NETWORK] Loaded credentials for: {self.username}")
+                self.store.put(DOC_CREDENTIALS, {"username": data.get("username")})
+                log("credentials", echo=f"[NETWORK] Imported credentials from: {self.legacy_credential_file}",
+                    migrated=True)
             except Exception as e:
-                print(f"[NETWORK] Error reading credential file: {e}")
+                log("credentials", echo=f"[NETWORK] Error reading credential file: {e}", error=str(e))
+                data = None
+        saved_name = data.get("username") if data else None
+        if saved_name:
+            self.username = saved_name
+            log("credentials", echo=f"[NETWORK] Loaded credentials for: {self.username}", loaded=True)
         else:
-            print("[NETWORK] No credential file found.")
+            log("credentials", echo="[NETWORK] No saved credentials found.", loaded=False)
 
     def save_local_credentials(self, username):
         """
-        Saves the user's username to a local JSON file for future sessions.
+        Saves the user's username for future sessions. The file is written in the background.
 
         Args:
             username (str): The username to save.
         """
-        try:
-            with open(self.credential_file, "w") as f:
-                json.dump({"username": username}, f)
-            print(f"[NETWORK] Credentials saved to: {self.credential_file}")
-        except Exception as e:
-            print(f"[NETWORK] Save Error: {e}")
+        self.store.put(DOC_CREDENTIALS, {"username": username})
+        log("credentials", echo=f"[NETWORK] Credentials saved to: {self.store.path(DOC_CREDENTIALS)}", saved=True)
 
     def register_user(self, username):
         """
@@ -77,9 +93,12 @@ class NetworkManager:
         if not username or not username.strip():
             return False, "EMPTY NAME"
 
+        import requests
         try:
-            print(f"[NETWORK] Connecting to: {API_URL}/register")
-            response = requests.post(f"{API_URL}/register", json={'username': username}, timeout=5)
+            log("http", echo=f"[NETWORK] Connecting to: {API_URL}/register", endpoint="register", phase="connect")
+            with timed("http", endpoint="register") as event:
+                response = requests.post(f"{API_URL}/register", json={'username': username}, timeout=5)
+                event["status"] = response.status_code
             
             # A 200 (Created) or 409 (Conflict/Already Exists) are both considered successful logins.
             if response.status_code == 200 or response.status_code == 409:
@@ -99,13 +118,13 @@ class NetworkManager:
 
         except requests.exceptions.ConnectionError:
             # If the server can't be reached, enter an offline mode.
-            print("[NETWORK] Server unreachable. Switching to OFFLINE.")
+            log("offline", echo="[NETWORK] Server unreachable. Switching to OFFLINE.", endpoint="register")
             self.username = username
             self.save_local_credentials(username)
             return True, "OFFLINE MODE"
             
         except Exception as e:
-            print(f"[NETWORK] Error: {e}")
+            log("http_error", echo=f"[NETWORK] Error: {e}", endpoint="register", error=str(e))
             return False, "CONNECTION ERROR"
 
     def submit_score(self, score):
@@ -118,27 +137,47 @@ class NetworkManager:
         """
         if not self.username: return
         try:
+            import requests
             # Use a short timeout to avoid long hangs on game over.
-            requests.post(f"{API_URL}/submit", json={'username': self.username, 'score': score}, timeout=2)
-        except:
-            # Silently pass on any network errors during gameplay.
-            pass 
+            with timed("http", endpoint="submit") as event:
+                response = requests.post(f"{API_URL}/submit", json={'username': self.username, 'score': score}, timeout=2)
+                event["status"] = response.status_code
+        except Exception as e:
+            # Never interrupt the game over a failed submission; just record it.
+            log("http_error", endpoint="submit", error=type(e).__name__)
+
+    def cached_leaderboard(self):
+        """
+        Returns the last leaderboard that was downloaded, from the local store.
+
+        Returns:
+            list: The cached entries, or a placeholder if none was ever saved.
+        """
+        cached = self.store.get(DOC_LEADERBOARD)
+        if cached and cached.get("entries"):
+            return cached["entries"]
+        return [{"name": "Loading...", "score": 0}]
 
     def get_leaderboard(self):
         """
-        Fetches the top scores from the server.
+        Fetches the top scores from the server, and caches them in the local store.
 
         Returns:
             list: A list of dictionaries, where each dictionary contains
-                  a 'name' and 'score'. Returns a placeholder on failure.
+                  a 'name' and 'score'. Returns the cached leaderboard on failure.
         """
         try:
-            response = requests.get(f"{API_URL}/leaderboard", timeout=3)
+            import requests
+            with timed("http", endpoint="leaderboard") as event:
+                response = requests.get(f"{API_URL}/leaderboard", timeout=3)
+                event["status"] = response.status_code
             if response.status_code == 200:
                 data = response.json()
                 # Standardize the format to what the UI expects.
-                return [{"name": item["username"], "score": item["high_score"]} for item in data]
-        except:
-            # If fetching fails, return a default list to avoid crashing the UI.
-            pass
-        return [{"name": "Loading...", "score": 0}]
\ No newline at end of file
+                entries = [{"name": item["username"], "score": item["high_score"]} for item in data]
+                self.store.put(DOC_LEADERBOARD, {"time": time.time(), "entries": entries})
+                return entries
+        except Exception as e:
+            # If fetching fails, fall back to the last known list to avoid crashing the UI.
+            log("http_error", endpoint="leaderboard", error=type(e).__name__)
+        return self.cached_leaderboard()
\ No newline at end of file
@@ -0,0 +1,288 @@
+# recorder.py
+"""
+Video capture of the game canvas, and replays that can be rendered to video headlessly.
+
+`FrameRecorder` copies each captured frame into one of a few preallocated
+buffers and hands it to a background writer thread through a bounded queue;
+the game thread never waits on disk or on the encoder. The canvas is first
+blitted into a 32-bit staging surface with a fixed pixel layout (B, G, R, X in
+memory), and the pooled buffer is filled straight from that surface's pixel
+buffer (`Surface.get_view`), so a frame costs one SDL blit and one memory copy
+and no new allocations. Sinks receive the raw frames: `FFmpegSink` pipes them into an
+ffmpeg subprocess, `FileSink` writes them to a .raw file.
+
+A `Replay` is everything needed to replay a game: the piece seed, the board
+size and the input actions of every simulation step. `render_replay` plays one through a
+windowless `MainApp`, runs the normal drawing code and records each frame as
+fast as the machine allows, which is much faster than real time.
+
+Run `python recorder.py render REPLAY.json OUT.mp4 [FPS]` to render a replay.
+"""
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import pygame
+from settings import SIM_TICK_MS, GRID_WIDTH, GRID_HEIGHT
+from telemetry import log
+
+# Raw pixel format of captured frames, as named by ffmpeg.
+PIXEL_FORMAT = "bgr0"
+# Channel masks that give that byte order in memory on little-endian machines.
+PIXEL_MASKS = (0xFF0000, 0xFF00, 0xFF, 0) if sys.byteorder == "little" else (0xFF00, 0xFF0000, 0xFF000000, 0)
+
+
+class FileSink:
+    """Writes raw frames one after another to a file."""
+    def __init__(self, path, size, fps):
+        """
+        Opens the output file.
+
+        Args:
+            path (str): The output path (raw BGR0 frames).
+            size (tuple): The frame (width, height).
+            fps (int): The frame rate, only used for the conversion hint.
+        """
+        self.path = path
+        self.file = open(path, "wb")
+        log("recording", echo=f"[RECORDER] Writing raw frames to {path}. Convert with: ffmpeg -f rawvideo "
+            f"-pix_fmt {PIXEL_FORMAT} -s {size[0]}x{size[1]} -r {fps} -i {path} -pix_fmt yuv420p out.mp4",
+            path=path, raw=True)
+
+    def write(self, frame):
+        """Appends one frame."""
+        self.file.write(frame)
+
+    def close(self):
+        """Closes the file."""
+        self.file.close()
+
+
+class FFmpegSink:
+    """Encodes raw frames to a video file by piping them into ffmpeg."""
+    def __init__(self, path, size, fps, codec_args=("-c:v", "libx264", "-preset", "veryfast", "-crf", "18")):
+        """
+        Starts the encoder process.
+
+        Args:
+            path (str): The output video path.
+            size (tuple): The frame (width, height).
+            fps (int): The frame rate.
+            codec_args (tuple, optional): Encoder options. Defaults to H.264 at CRF 18.
+        """
+        self.path = path
+        command = ["ffmpeg", "-loglevel", "error", "-y",
+                   "-f", "rawvideo", "-pix_fmt", PIXEL_FORMAT, "-s", f"{size[0]}x{size[1]}", "-r", str(fps),
+                   "-i", "-", *codec_args, "-pix_fmt", "yuv420p", path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        """Sends one frame to the encoder."""
+        self.process.stdin.write(frame)
+
+    def close(self):
+        """Finishes the video and waits for the encoder to exit."""
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def open_sink(path, size, fps):
+    """
+    Picks a sink for an output path: ffmpeg for video files when it is installed, else raw frames.
+
+    Args:
+        path (str): The output path.
+        size (tuple): The frame (width, height).
+        fps (int): The frame rate.
+
+    Returns:
+        FileSink or FFmpegSink: The sink.
+    """
+    if not path.endswith(".raw"):
+        if shutil.which("ffmpeg"):
+            return FFmpegSink(path, size, fps)
+        log("recording", echo="[RECORDER] ffmpeg not found; recording raw frames instead.", ffmpeg=False)
+        path = os.path.splitext(path)[0] + ".raw"
+    return FileSink(path, size, fps)
+
+
+class FrameRecorder:
+    """
+    Captures frames on the caller's thread and writes them on a background thread.
+    """
+    def __init__(self, sink, size, queue_size=8):
+        """
+        Allocates the staging surface and frame buffers and starts the writer thread.
+
+        Args:
+            sink (FileSink or FFmpegSink): Where the frames go.
+            size (tuple): The frame (width, height).
+            queue_size (int, optional): How many frames may wait for the writer. Defaults to 8.
+        """
+        self.sink = sink
+        self.size = size
+        self.staging = pygame.Surface(size, 0, 32, PIXEL_MASKS)
+        self.frame_bytes = size[0] * size[1] * 4
+        # Empty buffers ready to be filled, and filled buffers waiting to be written.
+        self.free = queue.Queue()
+        for _ in range(queue_size):
+            self.free.put(bytearray(self.frame_bytes))
+        self.pending = queue.Queue(maxsize=queue_size)
+        self.frames = 0
+        self.dropped = 0
+        self.writer = threading.Thread(target=self._write_loop, name="recorder", daemon=True)
+        self.writer.start()
+
+    def capture(self, surface, block=False):
+        """
+        Queues a copy of a surface as the next frame.
+
+        Args:
+            surface (pygame.Surface): The frame, the same size as the recording.
+            block (bool, optional): Wait for a free buffer instead of dropping the
+                                    frame when the writer is behind. Defaults to False.
+
+        Returns:
+            bool: True if the frame was queued, False if it was dropped.
+        """
+        try:
+            buffer = self.free.get(block)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        self.staging.blit(surface, (0, 0))
+        if self.staging.get_pitch() == self.size[0] * 4:
+            buffer[:] = self.staging.get_view("0")
+        else:
+            # Rows are padded; fall back to a packed copy.
+            buffer[:] = pygame.image.tobytes(self.staging, "BGRA")
+        self.pending.put(buffer)
+        self.frames += 1
+        return True
+
+    def _write_loop(self):
+        """Writes queued frames to the sink until `close()` sends the stop marker."""
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            try:
+                self.sink.write(buffer)
+            except (OSError, ValueError) as e:
+                log("recording_error", echo=f"[RECORDER] Writing a frame failed: {e}", error=str(e))
+            self.free.put(buffer)
+
+    def close(self):
+        """Writes the remaining frames, then closes the sink."""
+        self.pending.put(None)
+        self.writer.join()
+        self.sink.close()
+        log("recording", echo=f"[RECORDER] {self.frames} frames recorded, {self.dropped} dropped.",
+            frames=self.frames, dropped=self.dropped)
+
+
+class Replay:
+    """
+    A recorded game: its seed, its board size and the input actions of every simulation step.
+    """
+    def __init__(self, seed, steps=None, ticks=0, board_size=(GRID_WIDTH, GRID_HEIGHT)):
+        """
+        Creates a replay.
+
+        Args:
+            seed (int): The seed the game was started with.
+            steps (dict, optional): Step number -> list of (action, is_repeat) pairs. Defaults to none.
+            ticks (int, optional): The number of steps recorded. Defaults to 0.
+            board_size (tuple, optional): The board (width, height). Defaults to GRID_WIDTH x GRID_HEIGHT.
+        """
+        self.seed = seed
+        self.steps = steps or {}
+        self.ticks = ticks
+        self.board_size = tuple(board_size)
+
+    def record(self, actions):
+        """Appends one simulation step's actions (steps without input cost nothing)."""
+        if actions:
+            self.steps[self.ticks] = list(actions)
+        self.ticks += 1
+
+    def to_dict(self):
+        """Returns the replay as JSON-serializable data."""
+        return {"seed": self.seed, "ticks": self.ticks, "board": list(self.board_size),
+                "steps": [[tick, actions] for tick, actions in self.steps.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a replay from the data made by `to_dict`."""
+        steps = {tick: [tuple(action) for action in actions] for tick, actions in data["steps"]}
+        # Replays from before board sizes were configurable have no "board".
+        return cls(data["seed"], steps, data["ticks"], data.get("board", (GRID_WIDTH, GRID_HEIGHT)))
+
+    def save(self, path):
+        """Writes the replay as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        """Reads a replay written by `save` (or saved in the local store)."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def render_replay(replay, path, fps=30):
+    """
+    Renders a replay to a video without opening a window.
+
+    The game runs through `MainApp.step_simulation` exactly as it did live, and
+    frames are drawn with `MainApp.draw_on_canvas`, every 1/fps seconds of game time.
+
+    Args:
+        replay (Replay): The game to render.
+        path (str): The output video path.
+        fps (int, optional): The video frame rate. Defaults to 30.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from main import MainApp
+    app = MainApp(offline=True, board_size=replay.board_size)
+    app.logic.reset(replay.seed)
+    app.state = "PLAYING"
+    app.gravity_elapsed = 0
+    size = app.canvas.get_size()
+    recorder = FrameRecorder(open_sink(path, size, fps), size)
+    frame_ms = 1000 / fps
+    game_ms = 0.0
+    next_frame_ms = 0.0
+    started = time.perf_counter()
+    for tick in range(replay.ticks):
+        app.step_simulation(replay.steps.get(tick, []))
+        game_ms += SIM_TICK_MS
+        while next_frame_ms <= game_ms:
+            next_frame_ms += frame_ms
+            app.ui.update_animation()
+            app.effects.update(frame_ms / 1000)
+            app.draw_on_canvas()
+            recorder.capture(app.canvas, block=True)
+    if app.logic.game_over:
+        # Hold the game over screen for a second at the end of the clip.
+        app.state = "GAMEOVER"
+        for _ in range(fps):
+            app.ui.update_animation()
+            app.effects.update(frame_ms / 1000)
+            app.draw_on_canvas()
+            recorder.capture(app.canvas, block=True)
+    recorder.close()
+    elapsed = time.perf_counter() - started
+    print(f"[RECORDER] Rendered {game_ms / 1000:.1f}s of play in {elapsed:.1f}s "
+          f"({game_ms / 1000 / max(elapsed, 1e-9):.1f}x real time), score {app.logic.score}.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "render":
+        render_replay(Replay.load(sys.argv[2]), sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 30)
+    else:
+        print("Usage: python recorder.py render REPLAY.json OUT.mp4 [FPS]")
@@ -0,0 +1,407 @@
+# relay.py
+"""
+The versus-mode relay server, its client, and a netcode benchmark.
+
+The relay never simulates anything: it pairs players into matches and
+forwards each player's input packets, byte for byte, to the other players of
+the same match. One asyncio event loop serves every match, and the per-packet
+work is a fixed-size header read plus one write per opponent, so a single
+process can carry many concurrent matches.
+
+All messages are big-endian `struct` records with a one-byte type:
+
+    HELLO   client -> relay   type, match id (u32), players (u8)              6 bytes
+    START   relay -> client   type, player index (u8), players (u8), seed (u32)  7 bytes
+    INPUTS  both ways         type, player (u8), first tick (u32), count (u8),
+                              then `count` input bytes                        7 + count bytes
+    LEFT    relay -> client   type, player (u8)                               2 bytes
+
+An INPUTS packet carries consecutive ticks, so a client that sends once per
+frame batches every tick it simulated during that frame into one packet.
+
+Run `python relay.py` to start a relay, or `python relay.py bench` to measure
+bandwidth, latency and rollbacks with bot players under simulated delay.
+"""
+import asyncio
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from settings import VERSUS_HOST, VERSUS_PORT
+from telemetry import log
+
+# --- Protocol ---
+MSG_HELLO = 1
+MSG_START = 2
+MSG_INPUTS = 3
+MSG_LEFT = 4
+
+HELLO = struct.Struct("!BIB")
+START = struct.Struct("!BBBI")
+INPUTS_HEADER = struct.Struct("!BBIB")
+LEFT = struct.Struct("!BB")
+
+# A player whose unsent backlog grows past this is too slow to keep up and is dropped.
+MAX_WRITE_BUFFER = 64 * 1024
+
+
+def encode_inputs(player, inputs):
+    """
+    Packs consecutive (tick, bits) inputs into INPUTS packets.
+
+    Args:
+        player (int): The player the inputs belong to.
+        inputs (list): (tick, bits) pairs for consecutive ticks.
+
+    Returns:
+        bytes: One packet per 255 inputs, concatenated.
+    """
+    packets = []
+    for start in range(0, len(inputs), 255):
+        chunk = inputs[start:start + 255]
+        packets.append(INPUTS_HEADER.pack(MSG_INPUTS, player, chunk[0][0], len(chunk)))
+        packets.append(bytes(bits for _, bits in chunk))
+    return b"".join(packets)
+
+
+class RelayServer:
+    """
+    Matches players by match id and forwards their input packets.
+    """
+    def __init__(self, host=VERSUS_HOST, port=VERSUS_PORT):
+        """
+        Initializes the relay.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to VERSUS_HOST.
+            port (int, optional): The port to listen on; 0 picks a free one. Defaults to VERSUS_PORT.
+        """
+        self.host = host
+        self.port = port
+        # match id -> list of writers; players join in order and get their list index.
+        self.matches = {}
+        self.server = None
+
+    async def start(self):
+        """Starts listening. The actual port is stored in `self.port`."""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        log("relay", echo=f"[RELAY] Listening on {self.host}:{self.port}", port=self.port)
+
+    async def stop(self):
+        """Stops listening and closes every connection."""
+        self.server.close()
+        for writers in self.matches.values():
+            for writer in writers:
+                writer.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        """Serves one player: joins them to a match, then forwards their inputs until they leave."""
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            _, match_id, num_players = HELLO.unpack(await reader.readexactly(HELLO.size))
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            writer.close()
+            return
+
+        # Players get their index in this list with START; until then it can still shrink.
+        writers = self.matches.setdefault(match_id, [])
+        writers.append(writer)
+        if len(writers) == num_players:
+            seed = random.getrandbits(32)
+            for index, peer in enumerate(writers):
+                peer.write(START.pack(MSG_START, index, num_players, seed))
+            # The match is full; later players with the same id start a new one.
+            del self.matches[match_id]
+
+        try:
+            while True:
+                header = await reader.readexactly(INPUTS_HEADER.size)
+                packet = header + await reader.readexactly(header[-1])
+                for peer in writers:
+                    if peer is writer or peer.is_closing():
+                        continue
+                    if peer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                        peer.close()
+                        continue
+                    peer.write(packet)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.matches.get(match_id) is writers:
+                # Still waiting for players: free this slot; the others keep waiting.
+                writers.remove(writer)
+                if not writers:
+                    del self.matches[match_id]
+            else:
+                player = writers.index(writer)
+                for peer in writers:
+                    if peer is not writer and not peer.is_closing():
+                        peer.write(LEFT.pack(MSG_LEFT, player))
+            writer.close()
+
+
+class RelayClient:
+    """
+    The game side of the relay connection.
+
+    Uses a non-blocking socket polled from the game loop, so the window never
+    waits on the network. The connection itself is opened on a background
+    thread, since an unreachable relay can take seconds to time out.
+    """
+    def __init__(self, host=VERSUS_HOST, port=VERSUS_PORT, match_id=0, num_players=2):
+        """
+        Initializes the client. Nothing is sent until `connect()`.
+
+        Args:
+            host (str, optional): The relay address. Defaults to VERSUS_HOST.
+            port (int, optional): The relay port. Defaults to VERSUS_PORT.
+            match_id (int, optional): Players with the same id play together. Defaults to 0.
+            num_players (int, optional): How many players the match waits for. Defaults to 2.
+        """
+        self.address = (host, port)
+        self.match_id = match_id
+        self.num_players = num_players
+        self.sock = None
+        self.buffer = bytearray()
+        # Set by START: (player index, players, seed).
+        self.start_info = None
+        self.players_left = []
+        self.connected = False
+        # True while a connection attempt is running in the background.
+        self.connecting = False
+        # Incremented by every `connect()` and `close()`, so a stale attempt knows to give up.
+        self.attempt = 0
+        self.lock = threading.Lock()
+
+    def connect(self, timeout=3.0):
+        """
+        Starts connecting to the relay and asking to join the match, in the background.
+
+        Poll `connecting` and `connected` to follow the attempt; `poll()` returns
+        nothing until the connection is established.
+
+        Args:
+            timeout (float, optional): Seconds before an unreachable relay is given up on. Defaults to 3.0.
+        """
+        with self.lock:
+            self.attempt += 1
+            self.connecting = True
+            attempt = self.attempt
+        threading.Thread(target=self._connect, args=(attempt, timeout), name="relay-connect", daemon=True).start()
+
+    def _connect(self, attempt, timeout):
+        """The connection thread: opens the socket and sends HELLO, unless `close()` came first."""
+        try:
+            sock = socket.create_connection(self.address, timeout=timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(HELLO.pack(MSG_HELLO, self.match_id, self.num_players))
+            sock.setblocking(False)
+        except OSError as e:
+            log("versus_error", echo=f"[VERSUS] Could not reach the relay at {self.address[0]}:{self.address[1]}: {e}",
+                error=str(e))
+            sock = None
+        with self.lock:
+            if attempt != self.attempt:
+                # Cancelled (or superseded) while connecting.
+                if sock:
+                    sock.close()
+                return
+            self.sock = sock
+            self.connected = sock is not None
+            self.connecting = False
+
+    def send_inputs(self, player, inputs):
+        """Sends local (tick, bits) inputs for consecutive ticks in one write."""
+        if inputs and self.connected:
+            try:
+                self.sock.sendall(encode_inputs(player, inputs))
+            except BlockingIOError:
+                # The kernel buffer is full, which only happens if the relay stalls.
+                log("versus_error", echo="[VERSUS] Send buffer full; dropping the connection.", error="send_buffer_full")
+                self.close()
+            except OSError:
+                self.close()
+
+    def poll(self):
+        """
+        Reads everything that has arrived.
+
+        Returns:
+            list: (player, tick, bits) inputs from the other players, in arrival order.
+                  START and LEFT messages update `start_info` and `players_left`.
+        """
+        if not self.connected:
+            return []
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    self.close()
+                    break
+                self.buffer += data
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.close()
+
+        received = []
+        buffer = self.buffer
+        offset = 0
+        while offset < len(buffer):
+            kind = buffer[offset]
+            if kind == MSG_INPUTS:
+                if len(buffer) - offset < INPUTS_HEADER.size:
+                    break
+                _, player, first_tick, count = INPUTS_HEADER.unpack_from(buffer, offset)
+                end = offset + INPUTS_HEADER.size + count
+                if len(buffer) < end:
+                    break
+                for i, bits in enumerate(buffer[offset + INPUTS_HEADER.size:end]):
+                    received.append((player, first_tick + i, bits))
+                offset = end
+            elif kind == MSG_START:
+                if len(buffer) - offset < START.size:
+                    break
+                self.start_info = START.unpack_from(buffer, offset)[1:]
+                offset += START.size
+            elif kind == MSG_LEFT:
+                if len(buffer) - offset < LEFT.size:
+                    break
+                self.players_left.append(LEFT.unpack_from(buffer, offset)[1])
+                offset += LEFT.size
+            else:
+                log("versus_error", echo=f"[VERSUS] Unknown message type {kind}; dropping the connection.",
+                    error="unknown_message", kind=kind)
+                self.close()
+                break
+        del buffer[:offset]
+        return received
+
+    def close(self):
+        """Closes the connection, or cancels the attempt in progress."""
+        with self.lock:
+            self.attempt += 1
+            self.connecting = False
+            if self.sock:
+                self.sock.close()
+                self.sock = None
+            self.connected = False
+
+
+# --- Benchmark ---
+
+async def _bench_player(port, match_id, ticks, delay_ms, jitter_ms, stats, sent_at, rng):
+    """
+    One simulated player: a `VersusSession` at 60 ticks per second with random inputs.
+
+    Every outgoing packet is held back by `delay_ms` plus up to `jitter_ms` to
+    simulate the network path (order is preserved, like TCP).
+    """
+    from versus import VersusSession, INPUT_LEFT, INPUT_RIGHT, INPUT_ROTATE, INPUT_HARD_DROP
+    from settings import SIM_TICK_MS
+    loop = asyncio.get_running_loop()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    writer.write(HELLO.pack(MSG_HELLO, match_id, 2))
+    _, player, num_players, seed = START.unpack(await reader.readexactly(START.size))
+    session = VersusSession(num_players, player, seed)
+
+    async def receive():
+        while True:
+            header = await reader.readexactly(INPUTS_HEADER.size)
+            body = await reader.readexactly(header[-1])
+            now = time.perf_counter()
+            _, sender, first_tick, _ = INPUTS_HEADER.unpack(header)
+            stats["latency"].append(now - sent_at[(match_id, sender, first_tick)])
+            for i, bits in enumerate(body):
+                session.receive_input(sender, first_tick + i, bits)
+
+    receiver = asyncio.ensure_future(receive())
+    choices = (0,) * 12 + (INPUT_LEFT, INPUT_RIGHT, INPUT_ROTATE, INPUT_HARD_DROP)
+    last_release = 0.0
+    started = time.perf_counter()
+    while session.tick < ticks:
+        # Sleep until the next tick is due.
+        due = started + session.tick * SIM_TICK_MS / 1000
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        if not session.step(rng.choice(choices)):
+            stats["stalls"] += 1
+            continue
+        outbox = session.take_outbox()
+        if outbox:
+            packet = encode_inputs(player, outbox)
+            stats["bytes"] += len(packet)
+            stats["packets"] += 1
+            sent_at[(match_id, player, outbox[0][0])] = time.perf_counter()
+            # Delays never reorder packets, like a TCP stream.
+            release = max(last_release, loop.time() + (delay_ms + rng.uniform(0, jitter_ms)) / 1000)
+            last_release = release
+            loop.call_at(release, writer.write, packet)
+
+    # Let the remaining inputs arrive, then settle the last rollback.
+    while session.confirmed_tick() < ticks:
+        await asyncio.sleep(0.01)
+    session.synchronize()
+    receiver.cancel()
+    # Delayed packets must leave before the connection closes.
+    await asyncio.sleep(max(0.0, last_release - loop.time()) + 0.05)
+    stats["rollbacks"] += session.rollbacks
+    stats["resimulated"] += session.resimulated_ticks
+    writer.close()
+    return session.state_key()
+
+
+async def _bench(matches, seconds, delay_ms, jitter_ms):
+    """Runs `matches` two-player bot matches through a local relay and prints the measurements."""
+    from settings import SIM_TICK_MS
+    relay = RelayServer("127.0.0.1", 0)
+    await relay.start()
+    ticks = int(seconds * 1000 / SIM_TICK_MS)
+    stats = {"latency": [], "bytes": 0, "packets": 0, "stalls": 0, "rollbacks": 0, "resimulated": 0}
+    sent_at = {}
+    rng = random.Random(0)
+    started = time.perf_counter()
+    keys = await asyncio.gather(*(_bench_player(relay.port, match, ticks, delay_ms, jitter_ms, stats, sent_at,
+                                                random.Random(rng.getrandbits(32)))
+                                  for match in range(matches) for _ in range(2)))
+    elapsed = time.perf_counter() - started
+    await relay.stop()
+
+    players = matches * 2
+    latency = sorted(stats["latency"])
+    desyncs = sum(keys[i] != keys[i + 1] for i in range(0, len(keys), 2))
+    # 40 bytes of IPv4 + TCP headers per packet, ignoring options and ACKs.
+    print(f"[BENCH] {matches} matches, {ticks} ticks, delay {delay_ms} ms + jitter {jitter_ms} ms, "
+          f"wall time {elapsed:.1f}s")
+    print(f"[BENCH] upstream per player: {stats['bytes'] / players / seconds:.0f} B/s payload, "
+          f"{(stats['bytes'] + 40 * stats['packets']) / players / seconds:.0f} B/s with TCP/IP headers")
+    print(f"[BENCH] one-way latency: p50 {latency[len(latency) // 2] * 1000:.1f} ms, "
+          f"p99 {latency[int(len(latency) * 0.99)] * 1000:.1f} ms")
+    print(f"[BENCH] rollbacks {stats['rollbacks'] / players:.0f} per player, "
+          f"{stats['resimulated'] / max(stats['rollbacks'], 1):.1f} ticks re-simulated each, "
+          f"stalled ticks {stats['stalls'] / players:.1f} per player, desynced matches {desyncs}")
+
+
+async def _serve_forever():
+    """Runs a relay until interrupted."""
+    relay = RelayServer()
+    await relay.start()
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        # python relay.py bench [MATCHES] [DELAY_MS] [JITTER_MS] [SECONDS]
+        args = [float(a) for a in sys.argv[2:]]
+        defaults = [20, 50, 10, 10]
+        matches, delay, jitter, seconds = args + defaults[len(args):]
+        asyncio.run(_bench(int(matches), seconds, delay, jitter))
+    else:
+        try:
+            asyncio.run(_serve_forever())
+        except KeyboardInterrupt:
+            pass
@@ -16,6 +16,16 @@ SCREEN_WIDTH = 750
 SCREEN_HEIGHT = 800 
 FPS = 60
 
+# --- Input & Simulation Timing (milliseconds) ---
+# The game logic advances in fixed steps, independent of the rendering frame rate.
+SIM_TICK_MS = 1000 / 60
+GRAVITY_MS = 500        # Time between automatic one-row drops.
+SOFT_DROP_MS = 50       # Time between drops while the down key is held.
+DAS_MS = 170            # Delayed auto-shift: how long left/right must be held before repeating.
+ARR_MS = 50             # Auto-repeat rate: time between repeated moves once DAS has charged.
+# Longest stall (e.g., while the window is dragged) the simulation will catch up on.
+MAX_CATCH_UP_MS = 250
+
 # --- Tetris Game Grid Dimensions ---
 BLOCK_SIZE = 35         # Size of a single block in pixels.
 GRID_WIDTH = 10         # Number of blocks horizontally.
@@ -27,6 +37,45 @@ GAME_AREA_HEIGHT = GRID_HEIGHT * BLOCK_SIZE
 # The base URL for the backend API server.
 API_URL = "https://tetris-py-api-5unr.vercel.app"
 
+# --- Local Data ---
+# Credentials, key bindings, replays and cached leaderboards are kept in a
+# per-user data directory (see store.py): the platform's user data folder for
+# DATA_APP_NAME, or DATA_FALLBACK_DIR in the home folder without platformdirs.
+DATA_APP_NAME = "TetrisNeonArcade"
+DATA_FALLBACK_DIR = ".tetris_neon_arcade"
+REPLAY_INDEX_LIMIT = 100     # Newest replays listed in the replays index.
+
+# --- Spectator Broadcast ---
+# Set SPECTATOR_ENABLED (or run `python main.py --spectate`) to let viewers
+# follow live games. The server only listens on this machine by default.
+SPECTATOR_ENABLED = False
+SPECTATOR_HOST = "127.0.0.1"
+SPECTATOR_PORT = 7777          # Newline-delimited JSON over TCP.
+SPECTATOR_WS_PORT = 7778       # The same messages over WebSocket (None to disable).
+SPECTATOR_KEYFRAME_MS = 2000   # Time between full-state keyframes.
+
+# --- Telemetry ---
+# Game, network and presence events are logged as newline-delimited JSON in the
+# user data directory, written in batches by a background thread (see telemetry.py).
+# Offline runs (replay rendering, headless tools) only echo to the console.
+TELEMETRY_ENABLED = True
+TELEMETRY_FILE = "telemetry.ndjson"
+TELEMETRY_MAX_BYTES = 5 * 1024 * 1024   # Rotate the file past this size.
+TELEMETRY_BACKUPS = 3                   # Rotated files kept (telemetry.ndjson.1, .2, ...).
+TELEMETRY_FLUSH_S = 2.0                 # Seconds between batched writes.
+TELEMETRY_BATCH = 512                   # Pending events that trigger an early write.
+# Fraction of events kept, per event kind (kinds not listed are always kept).
+TELEMETRY_SAMPLING = {
+    "spawn": 0.25,
+    "lock": 0.5,
+}
+
+# --- Versus Mode ---
+# Run `python relay.py` on a reachable machine, then `python main.py --versus HOST:PORT[:MATCH]`
+# on each player's machine. Players with the same match id play each other.
+VERSUS_HOST = "127.0.0.1"
+VERSUS_PORT = 7780
+
 # --- "Neon Arcade" Color Palette ---
 # This palette defines the visual theme of the game.
 COLOR_BG_DARK = (10, 10, 25)          # Deep blue background.
@@ -50,4 +99,5 @@ SHAPE_COLORS = [
     ((255, 0, 60),  (255, 150, 150), (150, 0, 0)),        # Red (Z)
     ((0, 80, 255),  (100, 150, 255), (0, 0, 150)),        # Blue (J)
     ((255, 120, 0), (255, 180, 100), (180, 80, 0)),       # Orange (L)
+    ((130, 130, 140), (190, 190, 200), (70, 70, 80)),     # Gray (garbage rows)
 ]
\ No newline at end of file
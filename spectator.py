@@ -0,0 +1,417 @@
+# spectator.py
+"""
+Live spectator broadcasting: a game publishes compact state deltas, and any
+number of viewers follow along over TCP or WebSocket.
+
+The game side (`SpectatorPublisher`) listens to `TetrisLogic` events and sends
+small messages only when something changes: the piece moved, a piece locked,
+rows were cleared. Every few seconds it also sends a keyframe (the full state),
+which new viewers start from and which lets lagging viewers resync.
+
+The server (`SpectatorServer`) runs an asyncio event loop on a background
+thread. Each message is encoded once and the same bytes are queued for every
+viewer. Every viewer has its own bounded queue: a viewer that cannot keep up
+has its backlog dropped and skips deltas until the next keyframe, so one slow
+connection never holds back the game or the other viewers.
+
+Messages are JSON arrays, one per line over TCP or one per text frame over
+WebSocket:
+
+    ["k", rows, piece, rotation, x, y, next, score, player]   keyframe
+    ["m", x, y, rotation]                                     piece moved/rotated
+    ["s", piece, next]                                        new piece spawned
+    ["l", [[x, y, value], ...]]                               piece locked
+    ["c", [row, ...], score]                                  rows cleared
+    ["w", lines, hole]                                        garbage rows added (versus)
+    ["r"]                                                     new game
+    ["g", score]                                              game over
+
+`rows` in a keyframe are strings of cell values, one character per cell.
+
+Run `python spectator.py watch [HOST] [PORT]` for a headless terminal viewer.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import sys
+import threading
+import time
+from logic import ROTATIONS, EVENT_RESET, EVENT_SPAWN, EVENT_LOCK, EVENT_CLEAR, EVENT_GAME_OVER, EVENT_RESTORE, \
+    EVENT_GARBAGE, GARBAGE_VALUE
+from settings import GRID_WIDTH, GRID_HEIGHT, SPECTATOR_HOST, SPECTATOR_PORT, SPECTATOR_WS_PORT, SPECTATOR_KEYFRAME_MS
+from telemetry import log
+
+# Magic value from RFC 6455 used to compute the WebSocket handshake response.
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def encode_websocket_frame(payload):
+    """
+    Wraps a payload in a single unmasked WebSocket text frame (server to client).
+
+    Args:
+        payload (bytes): The UTF-8 message.
+
+    Returns:
+        bytes: The complete frame.
+    """
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x81, length))
+    elif length < 65536:
+        header = bytes((0x81, 126)) + length.to_bytes(2, "big")
+    else:
+        header = bytes((0x81, 127)) + length.to_bytes(8, "big")
+    return header + payload
+
+
+class Viewer:
+    """One connected spectator and its outgoing queue."""
+    def __init__(self, writer, websocket, queue_size):
+        self.writer = writer
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # Set when the queue overflowed; deltas are skipped until the next keyframe.
+        self.lagging = False
+
+
+class SpectatorServer:
+    """
+    Fans published messages out to every connected viewer.
+
+    `publish` and `publish_keyframe` may be called from any thread (normally
+    the game loop); they only hand the message to the server's event loop.
+    """
+    def __init__(self, host=SPECTATOR_HOST, port=SPECTATOR_PORT, ws_port=SPECTATOR_WS_PORT, queue_size=256):
+        """
+        Initializes the server. Call `start()` to begin accepting viewers.
+
+        Args:
+            host (str, optional): The interface to listen on. Defaults to SPECTATOR_HOST.
+            port (int, optional): The raw TCP port (newline-delimited JSON). Defaults to SPECTATOR_PORT.
+            ws_port (int, optional): The WebSocket port, or None to disable it. Defaults to SPECTATOR_WS_PORT.
+            queue_size (int, optional): Messages a viewer may fall behind before it is resynced. Defaults to 256.
+        """
+        self.host = host
+        self.port = port
+        self.ws_port = ws_port
+        self.queue_size = queue_size
+        self.viewers = set()
+        self.loop = None
+        self.servers = []
+        # The latest keyframe and the deltas published since, so new viewers can catch up.
+        self.keyframe = None
+        self.since_keyframe = []
+        self.ready = threading.Event()
+
+    def start(self):
+        """Starts the event loop and the listening sockets on a daemon thread."""
+        threading.Thread(target=self._run, name="spectator-server", daemon=True).start()
+        self.ready.wait(timeout=5)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.servers.append(self.loop.run_until_complete(
+                asyncio.start_server(self._handle_tcp, self.host, self.port)))
+            if self.ws_port:
+                self.servers.append(self.loop.run_until_complete(
+                    asyncio.start_server(self._handle_websocket, self.host, self.ws_port)))
+            log("spectator", echo=f"[SPECTATOR] Broadcasting on {self.host}:{self.port}"
+                + (f" (WebSocket {self.ws_port})" if self.ws_port else ""), port=self.port, ws_port=self.ws_port)
+        except OSError as e:
+            log("spectator", echo=f"[SPECTATOR] Could not start server: {e}", error=str(e))
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        """Stops the event loop; open viewer connections are dropped with it."""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    # --- Publishing (any thread) ---
+
+    def publish(self, message):
+        """
+        Sends a delta message to every viewer.
+
+        Args:
+            message (list): A message in the format described in the module docstring.
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._fan_out, self._encode(message), False)
+
+    def publish_keyframe(self, message):
+        """
+        Sends a keyframe to every viewer and makes it the starting point for new viewers.
+
+        Args:
+            message (list): A keyframe ("k") message.
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._fan_out, self._encode(message), True)
+
+    @staticmethod
+    def _encode(message):
+        # Encoded once per message, then shared by every viewer: (TCP line, WebSocket frame).
+        payload = json.dumps(message, separators=(",", ":")).encode()
+        return payload + b"\n", encode_websocket_frame(payload)
+
+    # --- Event loop side ---
+
+    def _fan_out(self, encoded, is_keyframe):
+        if is_keyframe:
+            self.keyframe = encoded
+            self.since_keyframe.clear()
+        elif self.keyframe is not None:
+            self.since_keyframe.append(encoded)
+            if len(self.since_keyframe) >= self.queue_size:
+                # Too far from the last keyframe to replay; new viewers wait for the next one.
+                self.keyframe = None
+                self.since_keyframe.clear()
+
+        for viewer in self.viewers:
+            if viewer.lagging:
+                if not is_keyframe:
+                    continue
+                viewer.lagging = False
+            try:
+                viewer.queue.put_nowait(encoded)
+            except asyncio.QueueFull:
+                # Drop the backlog; the viewer picks up again at the next keyframe.
+                while not viewer.queue.empty():
+                    viewer.queue.get_nowait()
+                viewer.lagging = True
+
+    async def _serve(self, viewer):
+        """Sends the catch-up state, then streams the viewer's queue until it disconnects."""
+        self.viewers.add(viewer)
+        if self.keyframe is None:
+            viewer.lagging = True
+        else:
+            for encoded in [self.keyframe] + self.since_keyframe:
+                viewer.queue.put_nowait(encoded)
+        index = 1 if viewer.websocket else 0
+        try:
+            while True:
+                encoded = await viewer.queue.get()
+                viewer.writer.write(encoded[index])
+                # drain() waits only for this viewer's socket buffer.
+                await viewer.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            viewer.writer.close()
+
+    async def _handle_tcp(self, reader, writer):
+        viewer = Viewer(writer, False, self.queue_size)
+        sender = asyncio.ensure_future(self._serve(viewer))
+        # Viewers don't send anything; reading only tells us when they hang up.
+        await self._wait_for_disconnect(reader)
+        sender.cancel()
+
+    @staticmethod
+    async def _wait_for_disconnect(reader):
+        try:
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+
+    async def _handle_websocket(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        key = None
+        for line in request.decode(errors="replace").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        if not key:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            writer.close()
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        viewer = Viewer(writer, True, self.queue_size)
+        sender = asyncio.ensure_future(self._serve(viewer))
+        # Incoming frames (pings, close) are ignored; the connection ends when the socket does.
+        await self._wait_for_disconnect(reader)
+        sender.cancel()
+
+
+class SpectatorPublisher:
+    """
+    Publishes one game's state to a `SpectatorServer`.
+
+    Lock, clear, spawn and game-over deltas come from the game's events; call
+    `poll()` once per frame to publish piece movement and periodic keyframes.
+    """
+    def __init__(self, server, logic, player_name="GUEST", keyframe_ms=SPECTATOR_KEYFRAME_MS):
+        """
+        Starts following a game.
+
+        Args:
+            server (SpectatorServer): The server to publish to.
+            logic (TetrisLogic): The game to broadcast.
+            player_name (str, optional): The name shown to viewers. Defaults to "GUEST".
+            keyframe_ms (int, optional): Time between keyframes. Defaults to SPECTATOR_KEYFRAME_MS.
+        """
+        self.server = server
+        self.logic = logic
+        self.player_name = player_name
+        self.keyframe_interval = keyframe_ms / 1000
+        self.last_keyframe = 0.0
+        self.last_piece = None
+        logic.add_listener(self.on_logic_event)
+
+    def on_logic_event(self, event, data):
+        """Translates a `TetrisLogic` event into a delta message."""
+        if event == EVENT_LOCK:
+            self.server.publish(["l", [list(cell) for cell in data["cells"]]])
+        elif event == EVENT_CLEAR:
+            self.server.publish(["c", data["rows"], data["score"]])
+        elif event == EVENT_SPAWN:
+            self.server.publish(["s", data["piece"], data["next"]])
+        elif event == EVENT_RESET:
+            self.server.publish(["r"])
+        elif event == EVENT_GAME_OVER:
+            self.server.publish(["g", data["score"]])
+        elif event == EVENT_GARBAGE:
+            self.server.publish(["w", data["lines"], data["hole"]])
+        elif event == EVENT_RESTORE:
+            self.send_keyframe()
+
+    def send_keyframe(self):
+        """Publishes the full game state."""
+        logic = self.logic
+        rows = ["".join(map(str, row)) for row in logic.board]
+        self.server.publish_keyframe(["k", rows, logic.current_color_idx, logic.rotation, logic.piece_x,
+                                      logic.piece_y, logic.next_piece_idx, logic.score, self.player_name])
+        self.last_keyframe = time.monotonic()
+        self.last_piece = (logic.piece_x, logic.piece_y, logic.rotation)
+
+    def poll(self):
+        """Publishes piece movement since the last call, and a keyframe when one is due."""
+        if time.monotonic() - self.last_keyframe >= self.keyframe_interval:
+            self.send_keyframe()
+            return
+        logic = self.logic
+        piece = (logic.piece_x, logic.piece_y, logic.rotation)
+        if piece != self.last_piece:
+            self.last_piece = piece
+            self.server.publish(["m", *piece])
+
+
+class SpectatorView:
+    """
+    A viewer-side mirror of a broadcast game, rebuilt from keyframes and deltas.
+    """
+    def __init__(self):
+        self.board = [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+        self.piece = None
+        self.rotation = 0
+        self.piece_x = 0
+        self.piece_y = 0
+        self.next_piece = None
+        self.score = 0
+        self.player = "?"
+        self.game_over = False
+        # Nothing is shown until the first keyframe arrives.
+        self.synced = False
+
+    def apply(self, message):
+        """
+        Updates the mirror with one message.
+
+        Args:
+            message (list): A decoded message.
+        """
+        kind = message[0]
+        if kind == "k":
+            _, rows, self.piece, self.rotation, self.piece_x, self.piece_y, self.next_piece, self.score, self.player = message
+            self.board = [[int(ch) for ch in row] for row in rows]
+            self.synced = True
+            self.game_over = False
+        elif not self.synced:
+            return
+        elif kind == "m":
+            _, self.piece_x, self.piece_y, self.rotation = message
+        elif kind == "s":
+            _, self.piece, self.next_piece = message
+            self.rotation = 0
+        elif kind == "l":
+            for x, y, value in message[1]:
+                self.board[y][x] = value
+        elif kind == "c":
+            rows, self.score = message[1], message[2]
+            kept = [row for y, row in enumerate(self.board) if y not in rows]
+            self.board = [[0] * len(self.board[0]) for _ in rows] + kept
+        elif kind == "w":
+            lines, hole = message[1], message[2]
+            width = len(self.board[0])
+            self.board = self.board[lines:] + [[0 if x == hole else GARBAGE_VALUE for x in range(width)]
+                                               for _ in range(lines)]
+        elif kind == "r":
+            self.board = [[0] * len(self.board[0]) for _ in self.board]
+            self.score = 0
+            self.game_over = False
+        elif kind == "g":
+            self.score = message[1]
+            self.game_over = True
+
+    def render_text(self):
+        """Draws the board as colored terminal text."""
+        cells = [row[:] for row in self.board]
+        if self.piece is not None and not self.game_over:
+            for cy, row in enumerate(ROTATIONS[self.piece][self.rotation]):
+                for cx, val in enumerate(row):
+                    y, x = self.piece_y + cy, self.piece_x + cx
+                    if val and 0 <= y < len(cells) and 0 <= x < len(cells[0]):
+                        cells[y][x] = self.piece + 1
+        lines = [f"{self.player}  SCORE {self.score}" + ("  GAME OVER" if self.game_over else "")]
+        for row in cells:
+            # ANSI 256-color backgrounds, one per piece type.
+            lines.append("".join(f"\x1b[48;5;{(0, 51, 226, 129, 46, 196, 21, 208, 244)[v]}m  \x1b[0m" if v else " ."
+                                 for v in row))
+        return "\n".join(lines)
+
+
+def watch(host=SPECTATOR_HOST, port=SPECTATOR_PORT, fps=20):
+    """
+    A headless terminal viewer: connects over TCP and redraws the board as it changes.
+
+    Args:
+        host (str, optional): The server address. Defaults to SPECTATOR_HOST.
+        port (int, optional): The server's TCP port. Defaults to SPECTATOR_PORT.
+        fps (int, optional): The maximum redraw rate. Defaults to 20.
+    """
+    import socket
+    view = SpectatorView()
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile("rb")
+        last_draw = 0.0
+        for line in stream:
+            view.apply(json.loads(line))
+            if view.synced and time.monotonic() - last_draw >= 1 / fps:
+                last_draw = time.monotonic()
+                # Move the cursor home and redraw in place.
+                sys.stdout.write("\x1b[H\x1b[2J" + view.render_text() + "\n")
+                sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "watch":
+        watch(sys.argv[2] if len(sys.argv) > 2 else SPECTATOR_HOST,
+              int(sys.argv[3]) if len(sys.argv) > 3 else SPECTATOR_PORT)
+    else:
+        print("Usage: python spectator.py watch [HOST] [PORT]")
@@ -0,0 +1,181 @@
+# store.py
+"""
+Local persistence for the player's data: credentials, key bindings, the
+replays index, cached leaderboard snapshots, the font cache and the replays themselves.
+
+Every document is a JSON file in a per-user data directory (the platform's
+user data folder via `platformdirs`, or a hidden folder in the home directory
+when it is not installed). Documents are read once and then served from
+memory. Writes never touch the disk on the caller's thread: `put()` updates
+the in-memory copy and hands the document to a background writer, which
+coalesces repeated writes of the same document into the latest one.
+
+Each write goes to a temporary file that is flushed to disk and then moved
+over the old file with `os.replace`, which is atomic, so a crash or power
+loss mid-write leaves either the old document or the new one, never a torn file.
+
+Use the shared `STORE` instance; the writer thread starts with the first
+write and the last writes are flushed when the process exits.
+"""
+import atexit
+import json
+import os
+import threading
+from settings import DATA_APP_NAME, DATA_FALLBACK_DIR
+from telemetry import log
+
+# Document names.
+DOC_CREDENTIALS = "credentials"     # {"username": str}
+DOC_BINDINGS = "bindings"           # {key name: action}, see `input_manager.bindings_to_names`
+DOC_REPLAYS = "replays"             # [{"file": str, "score": int, "seed": int, "time": str}, ...]
+DOC_LEADERBOARD = "leaderboard"     # {"time": float, "entries": [{"name": str, "score": int}, ...]}
+DOC_FONT_CACHE = "font_cache"       # {"name|bold": [path, synthetic_bold(, checked_time)]}, see `fonts`
+
+
+def default_directory():
+    """Returns the per-user data directory for the game."""
+    try:
+        from platformdirs import user_data_dir
+    except ImportError:
+        return os.path.join(os.path.expanduser("~"), DATA_FALLBACK_DIR)
+    return user_data_dir(DATA_APP_NAME, appauthor=False)
+
+
+class LocalStore:
+    """
+    JSON documents on disk, read through a memory cache and written atomically in the background.
+    """
+    def __init__(self, directory=None):
+        """
+        Initializes the store. Nothing is read or written until a document is used.
+
+        Args:
+            directory (str, optional): Where the documents live. Defaults to `default_directory()`.
+        """
+        self.directory = directory or default_directory()
+        # Documents read or written so far, by name.
+        self.documents = {}
+        # Documents found not to exist, so `get()` does not look for them again.
+        self.missing = set()
+        # Documents waiting for the writer, by name -> (data, keep); only the latest version of each is kept.
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Held while files are being written, so `flush()` and the writer never overlap.
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.closed = False
+
+    def path(self, name):
+        """
+        Returns the file of a document.
+
+        Args:
+            name (str): The document name; "/" separates subfolders (e.g. "replays/...").
+
+        Returns:
+            str: The absolute path of the JSON file.
+        """
+        return os.path.join(self.directory, *name.split("/")) + ".json"
+
+    def get(self, name, default=None):
+        """
+        Returns a document, reading it from disk the first time.
+
+        The returned object is the store's own copy: change a document by
+        passing a new object to `put()`, not by modifying it in place.
+
+        Args:
+            name (str): The document name.
+            default (optional): Returned when the document does not exist or is unreadable. Defaults to None.
+
+        Returns:
+            The document's JSON data, or `default`.
+        """
+        if name in self.documents:
+            return self.documents[name]
+        if name in self.missing:
+            return default
+        try:
+            with open(self.path(name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self.missing.add(name)
+            return default
+        except (OSError, ValueError) as e:
+            log("store_error", echo=f"[STORE] Could not read {name}: {e}", document=name, error=str(e))
+            return default
+        self.documents[name] = data
+        return data
+
+    def put(self, name, data, keep=True):
+        """
+        Replaces a document. Returns at once; the file is written in the background.
+
+        Args:
+            name (str): The document name.
+            data: JSON-serializable data. The store keeps a reference, so it must not be modified afterwards.
+            keep (bool, optional): Keep the document in memory after it is written. Pass False for
+                                   write-once documents such as replays, so memory does not grow
+                                   with every one saved. Defaults to True.
+        """
+        self.documents[name] = data
+        self.missing.discard(name)
+        with self.lock:
+            self.pending[name] = (data, keep)
+        if self.closed:
+            # Late writes (e.g., from another exit handler) are written right away.
+            self.flush()
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="store", daemon=True)
+            self.thread.start()
+            # The thread is a daemon, so the last writes are flushed on the way out.
+            atexit.register(self.close)
+        self.wakeup.set()
+
+    def _run(self):
+        """The writer thread: writes pending documents whenever woken."""
+        while not self.closed:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes every pending document now, on the calling thread."""
+        with self.write_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+            for name, (data, keep) in batch.items():
+                self._write(name, data)
+                # Unless a newer version was put meanwhile, `get()` reads it back from disk from now on.
+                if not keep and self.documents.get(name) is data:
+                    del self.documents[name]
+
+    def _write(self, name, data):
+        """Writes one document atomically: temporary file, fsync, then rename over the old file."""
+        path = self.path(name)
+        temporary = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except (OSError, TypeError, ValueError) as e:
+            log("store_error", echo=f"[STORE] Could not write {name}: {e}", document=name, error=str(e))
+
+    def close(self):
+        """Stops the writer thread and writes whatever is left."""
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+
+
+# The store shared by the whole game.
+STORE = LocalStore()
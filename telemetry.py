@@ -0,0 +1,224 @@
+# telemetry.py
+"""
+A structured event log for per-session analytics and diagnostics.
+
+Recording an event only appends a small tuple to an in-memory ring buffer (a
+`deque` with a maximum length), so it is safe to call from the game loop.
+A background thread wakes up every few seconds, or as soon as a batch is
+full, takes everything in the buffer, encodes it as newline-delimited JSON and
+appends it to the log file in a single write. When the file grows past a size
+limit it is rotated (telemetry.ndjson -> telemetry.ndjson.1 -> ...). The file
+lives in the per-user data directory (see `store`), never next to the game.
+If it cannot be written (e.g., a read-only disk), the failure is reported once
+and the writer backs off, dropping batches until a retry succeeds.
+
+High-frequency events can be sampled per kind (TELEMETRY_SAMPLING), and if the
+writer ever falls behind, the ring buffer drops the oldest events instead of
+growing. Messages that used to be printed are still echoed to the console
+(by the writer thread, not the caller).
+
+Each line looks like:
+
+    {"t": 1718000000.123, "session": "4f1c...", "kind": "lock", "cells": 4}
+
+Use the module-level `log()` / `timed()` helpers, which write to the shared
+`TELEMETRY` instance, or register `TELEMETRY.on_logic_event` as a
+`TetrisLogic` listener to record game events.
+"""
+import atexit
+import collections
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logic import EVENT_LOCK, EVENT_CLEAR, EVENT_SPAWN, EVENT_GAME_OVER, EVENT_GARBAGE, EVENT_RESET
+from settings import (TELEMETRY_ENABLED, TELEMETRY_FILE, TELEMETRY_MAX_BYTES, TELEMETRY_BACKUPS,
+                      TELEMETRY_FLUSH_S, TELEMETRY_BATCH, TELEMETRY_SAMPLING)
+
+
+class Telemetry:
+    """
+    Buffers events in memory and writes them to a rotating NDJSON file in the background.
+    """
+    def __init__(self, path=None, enabled=TELEMETRY_ENABLED, capacity=8192, batch_size=TELEMETRY_BATCH,
+                 flush_interval=TELEMETRY_FLUSH_S, max_bytes=TELEMETRY_MAX_BYTES, backups=TELEMETRY_BACKUPS,
+                 sampling=TELEMETRY_SAMPLING):
+        """
+        Initializes the log. The writer thread starts with the first event.
+
+        Args:
+            path (str, optional): The log file. Defaults to TELEMETRY_FILE in the user data directory.
+            enabled (bool, optional): Whether events are written to the file at all. Defaults to TELEMETRY_ENABLED.
+            capacity (int, optional): The ring buffer size; older events are dropped beyond it. Defaults to 8192.
+            batch_size (int, optional): Pending events that wake the writer early. Defaults to TELEMETRY_BATCH.
+            flush_interval (float, optional): Seconds between regular flushes. Defaults to TELEMETRY_FLUSH_S.
+            max_bytes (int, optional): The file size that triggers a rotation. Defaults to TELEMETRY_MAX_BYTES.
+            backups (int, optional): How many rotated files are kept. Defaults to TELEMETRY_BACKUPS.
+            sampling (dict, optional): Event kind -> fraction of events kept. Defaults to TELEMETRY_SAMPLING.
+        """
+        # None until the first write; see `_default_path`.
+        self.path = path
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sampling = dict(sampling)
+        self.session = uuid.uuid4().hex[:12]
+        # (time, kind, fields, echo) tuples. Appending and popping from opposite
+        # ends of a deque are thread-safe without a lock.
+        self.buffer = collections.deque(maxlen=capacity)
+        self.recorded = 0
+        # After a failed write, batches are dropped until this time (see `flush`).
+        self.retry_at = 0.0
+        self.retry_delay = flush_interval
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.closed = False
+
+    def log(self, kind, echo=None, **fields):
+        """
+        Records one event. Cheap enough for the game loop: no I/O and no encoding.
+
+        Args:
+            kind (str): The event type, e.g. "lock" or "http".
+            echo (str, optional): A message to also print to the console. Defaults to None.
+            **fields: JSON-serializable details of the event.
+        """
+        rate = self.sampling.get(kind, 1.0)
+        if rate < 1.0 and random.random() >= rate and echo is None:
+            return
+        self.buffer.append((time.time(), kind, fields, echo))
+        self.recorded += 1
+        if self.thread is None and not self.closed:
+            self.thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self.thread.start()
+            # The thread is a daemon, so the last batch is written on the way out.
+            atexit.register(self.close)
+        if echo is not None or len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+
+    @contextmanager
+    def timed(self, kind, **fields):
+        """
+        Records how long a block took, as an event with an "ms" field.
+
+        Example:
+            with telemetry.timed("http", endpoint="leaderboard") as event:
+                event["status"] = response.status_code
+
+        Yields:
+            dict: The event's fields, which the block may add to.
+        """
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            fields["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.log(kind, **fields)
+
+    def on_logic_event(self, event, data):
+        """A `TetrisLogic` listener that records game events with compact fields."""
+        if event == EVENT_LOCK:
+            self.log("lock", cells=len(data["cells"]))
+        elif event == EVENT_CLEAR:
+            self.log("clear", lines=data["lines"], score=data["score"])
+        elif event == EVENT_SPAWN:
+            self.log("spawn", piece=data["piece"])
+        elif event == EVENT_GAME_OVER:
+            self.log("game_over", score=data["score"])
+        elif event == EVENT_GARBAGE:
+            self.log("garbage", lines=data["lines"])
+        elif event == EVENT_RESET:
+            self.log("game_start")
+
+    def _run(self):
+        """The writer thread: flushes every `flush_interval` seconds or when woken."""
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Encodes and writes everything buffered so far, in one write."""
+        lines = []
+        buffer = self.buffer
+        # Only what is buffered now; events added meanwhile wait for the next batch.
+        for _ in range(len(buffer)):
+            try:
+                timestamp, kind, fields, echo = buffer.popleft()
+            except IndexError:
+                break
+            if echo is not None:
+                print(echo)
+            if self.enabled:
+                record = {"t": round(timestamp, 3), "session": self.session, "kind": kind}
+                record.update(fields)
+                lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        if not lines or time.time() < self.retry_at:
+            return
+        if self.path is None:
+            self.path = self._default_path()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._rotate_if_needed()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            if not self.retry_at:
+                print(f"[TELEMETRY] Could not write {self.path}: {e}. Events are dropped until it works again.")
+            # Back off exponentially, up to a minute between attempts.
+            self.retry_at = time.time() + self.retry_delay
+            self.retry_delay = min(self.retry_delay * 2, 60.0)
+            return
+        self.retry_at = 0.0
+        self.retry_delay = self.flush_interval
+
+    @staticmethod
+    def _default_path():
+        """Returns TELEMETRY_FILE in the user data directory."""
+        # Imported here: `store` logs through this module, so it cannot be imported at the top.
+        from store import default_directory
+        return os.path.join(default_directory(), TELEMETRY_FILE)
+
+    def _rotate_if_needed(self):
+        """Shifts the log files along when the current one is too big."""
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        """Stops the writer thread and writes whatever is left."""
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+
+
+# The log shared by the whole game.
+TELEMETRY = Telemetry()
+
+
+def log(kind, echo=None, **fields):
+    """Records an event in the shared log; see `Telemetry.log`."""
+    TELEMETRY.log(kind, echo, **fields)
+
+
+def timed(kind, **fields):
+    """Times a block into the shared log; see `Telemetry.timed`."""
+    return TELEMETRY.timed(kind, **fields)
@@ -0,0 +1,230 @@
+# tiled.py
+"""
+A tiled view that draws many games at once, for bot tournaments and spectator walls.
+
+Every board gets a `BoardTile` that owns two cached surfaces: the locked
+cells, and the finished tile (cells, falling piece and score label). The
+locked cells are only redrawn when the board's Zobrist hash changes, and the
+tile is only recomposed when the board, the piece or the score changed, so
+most boards cost nothing on most frames. Cells are drawn from prebuilt block
+sprites with one `Surface.blits` call per redraw, and all the tiles go onto
+the window with one more `blits` call.
+
+Run `python tiled.py [BOARDS]` for a wall of bot games.
+"""
+import pygame
+from settings import GRID_WIDTH, GRID_HEIGHT, SHAPE_COLORS, COLOR_BG_DARK
+
+TILE_GAP = 6           # Pixels between tiles.
+LABEL_HEIGHT = 14      # Pixels reserved under each tile for the score, when a font is given.
+
+
+def make_block_sprite(color_tuple, size):
+    """
+    Builds a small bevelled block, a cheap version of `ArcadeUI.draw_3d_block`.
+
+    Args:
+        color_tuple (tuple): The (base, light, dark) colors.
+        size (int): The block size in pixels.
+
+    Returns:
+        pygame.Surface: The block.
+    """
+    base_color, light_color, dark_color = color_tuple
+    sprite = pygame.Surface((size, size))
+    sprite.fill(base_color)
+    if size >= 4:
+        edge = max(1, size // 8)
+        sprite.fill(light_color, (0, 0, size, edge))
+        sprite.fill(light_color, (0, 0, edge, size))
+        sprite.fill(dark_color, (0, size - edge, size, edge))
+        sprite.fill(dark_color, (size - edge, 0, edge, size))
+    return sprite
+
+
+def tile_layout(count, width, height, label_height=0, gap=TILE_GAP, board_size=(GRID_WIDTH, GRID_HEIGHT)):
+    """
+    Finds the grid that shows `count` boards with the largest possible cells.
+
+    Args:
+        count (int): How many boards to show.
+        width (int): The available width in pixels.
+        height (int): The available height in pixels.
+        label_height (int, optional): Extra pixels under each board. Defaults to 0.
+        gap (int, optional): Pixels between tiles. Defaults to TILE_GAP.
+        board_size (tuple, optional): The board (width, height) in cells. Defaults to GRID_WIDTH x GRID_HEIGHT.
+
+    Returns:
+        tuple: (columns, rows, block_size). The block size is at least 1.
+    """
+    grid_width, grid_height = board_size
+    best = (1, count, 1)
+    best_size = 0
+    for columns in range(1, count + 1):
+        rows = -(-count // columns)  # Ceiling division.
+        size = min((width - gap * (columns + 1)) // (columns * grid_width),
+                   (height - gap * (rows + 1) - label_height * rows) // (rows * grid_height))
+        if size > best_size:
+            best, best_size = (columns, rows, size), size
+    return best[0], best[1], max(best_size, 1)
+
+
+class BoardTile:
+    """
+    The cached drawing of one game at a small block size.
+    """
+    def __init__(self, block_size, sprites, atlas=None, board_size=(GRID_WIDTH, GRID_HEIGHT)):
+        """
+        Allocates the tile's surfaces.
+
+        Args:
+            block_size (int): The cell size in pixels.
+            sprites (list): Block sprites indexed by board value (index 0 is unused).
+            atlas (GlyphAtlas, optional): Draws the score label. Defaults to no label.
+            board_size (tuple, optional): The board (width, height) in cells. Defaults to GRID_WIDTH x GRID_HEIGHT.
+        """
+        self.block_size = block_size
+        self.sprites = sprites
+        self.atlas = atlas
+        self.label_y = board_size[1] * block_size + 1
+        board_size = (board_size[0] * block_size, board_size[1] * block_size)
+        self.cells = pygame.Surface(board_size)
+        label = LABEL_HEIGHT if atlas else 0
+        self.surface = pygame.Surface((board_size[0], board_size[1] + label))
+        self.shade = pygame.Surface(board_size)
+        self.shade.set_alpha(150)
+        # What the cached surfaces currently show.
+        self.board_key = None
+        self.tile_key = None
+        self.redraws = 0
+
+    def update(self, logic):
+        """
+        Brings the tile up to date with a game, redrawing only what changed.
+
+        Args:
+            logic (TetrisLogic): The game shown in this tile.
+
+        Returns:
+            pygame.Surface: The tile.
+        """
+        board_key = logic.board_hash
+        if board_key != self.board_key:
+            self.board_key = board_key
+            self.redraw_cells(logic.board)
+            self.redraws += 1
+
+        tile_key = (board_key, logic.current_color_idx, logic.rotation, logic.piece_x, logic.piece_y,
+                    logic.game_over, logic.score)
+        if tile_key != self.tile_key:
+            self.tile_key = tile_key
+            self.compose(logic)
+        return self.surface
+
+    def redraw_cells(self, board):
+        """Redraws the locked cells in one batched blit."""
+        size = self.block_size
+        sprites = self.sprites
+        self.cells.fill((20, 20, 40))
+        self.cells.blits([(sprites[val], (x * size, y * size))
+                          for y, row in enumerate(board) for x, val in enumerate(row) if val], doreturn=False)
+
+    def compose(self, logic):
+        """Builds the tile from the cached cells, the falling piece and the score."""
+        size = self.block_size
+        surface = self.surface
+        surface.fill(COLOR_BG_DARK)
+        surface.blit(self.cells, (0, 0))
+        if logic.game_over:
+            surface.blit(self.shade, (0, 0))
+        elif logic.current_piece:
+            sprite = self.sprites[logic.current_color_idx + 1]
+            surface.blits([(sprite, ((logic.piece_x + cx) * size, (logic.piece_y + cy) * size))
+                           for cy, row in enumerate(logic.current_piece) for cx, val in enumerate(row) if val],
+                          doreturn=False)
+        if self.atlas:
+            self.atlas.blit(surface, str(logic.score), (0, self.label_y))
+
+
+class TiledRenderer:
+    """
+    Lays out and draws a wall of games inside a rectangle.
+    """
+    def __init__(self, rect, count, font=None, gap=TILE_GAP, board_size=(GRID_WIDTH, GRID_HEIGHT)):
+        """
+        Computes the layout and creates the tiles.
+
+        Args:
+            rect (tuple): The (x, y, width, height) area to fill.
+            count (int): How many games will be shown.
+            font (pygame.font.Font, optional): Font for the score labels. Defaults to no labels.
+            gap (int, optional): Pixels between tiles. Defaults to TILE_GAP.
+            board_size (tuple, optional): The size of every game's board, in cells.
+                                          Defaults to GRID_WIDTH x GRID_HEIGHT.
+        """
+        from fonts import GlyphAtlas
+        x, y, width, height = rect
+        atlas = GlyphAtlas(font, (200, 200, 200)) if font else None
+        label = LABEL_HEIGHT if font else 0
+        self.columns, self.rows, self.block_size = tile_layout(count, width, height, label, gap, board_size)
+        size = self.block_size
+        # One sprite per board value (pieces and garbage), shared by every tile.
+        self.sprites = [None] + [make_block_sprite(colors, size) for colors in SHAPE_COLORS]
+        self.tiles = [BoardTile(size, self.sprites, atlas, board_size) for _ in range(count)]
+        tile_w = board_size[0] * size
+        tile_h = board_size[1] * size + label
+        # Center the grid in the area.
+        left = x + (width - self.columns * tile_w - (self.columns - 1) * gap) // 2
+        top = y + (height - self.rows * tile_h - (self.rows - 1) * gap) // 2
+        self.positions = [(left + (i % self.columns) * (tile_w + gap), top + (i // self.columns) * (tile_h + gap))
+                          for i in range(count)]
+
+    def draw(self, target, logics):
+        """
+        Draws every game onto a surface.
+
+        Args:
+            target (pygame.Surface): The surface to draw onto.
+            logics (list): The games, in tile order (at most as many as tiles).
+        """
+        target.blits([(tile.update(logic), position)
+                      for tile, logic, position in zip(self.tiles, logics, self.positions)], doreturn=False)
+
+    def redraw_count(self):
+        """Returns how many times board cells were redrawn in total (for profiling)."""
+        return sum(tile.redraws for tile in self.tiles)
+
+
+if __name__ == "__main__":
+    # A wall of bot games, with the frame rate and the share of boards redrawn per frame.
+    import sys
+    import time
+    from bot import DemoPlayer, PlacementBot
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((1280, 800), pygame.RESIZABLE)
+    pygame.display.set_caption(f"TETRIS: {count} BOTS")
+    bot = PlacementBot()
+    players = [DemoPlayer(bot, frames_per_action=3) for _ in range(count)]
+    renderer = TiledRenderer((0, 0, 1280, 800), count, pygame.font.Font(None, LABEL_HEIGHT + 2))
+    clock = pygame.time.Clock()
+    frames = 0
+    draw_time = 0.0
+    started = time.perf_counter()
+    while True:
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        for player in players:
+            player.update()
+        screen.fill(COLOR_BG_DARK)
+        draw_started = time.perf_counter()
+        renderer.draw(screen, [player.logic for player in players])
+        draw_time += time.perf_counter() - draw_started
+        pygame.display.flip()
+        clock.tick(60)
+        frames += 1
+        if frames % 300 == 0:
+            elapsed = time.perf_counter() - started
+            print(f"[TILED] {count} boards: {frames / elapsed:.0f} FPS, draw {draw_time / frames * 1000:.2f} ms/frame, "
+                  f"{renderer.redraw_count() / (frames * count):.1%} board redraws per frame")
@@ -5,10 +5,34 @@ Manages all graphical user interface (UI) elements and rendering for the game.
 This module defines the `ArcadeUI` class, which is responsible for drawing everything
 the player sees, including the game board, pieces, sidebar, text, and special effects
 like pulsing animations and neon borders.
+
+The locked cells of a board are kept on a cached surface by `BoardLayer`,
+which follows the game's events and redraws only the rows that changed, so a
+frame costs the same on a 40x80 challenge board as on the standard one.
 """
 import pygame
 import math
 from settings import *
+from fonts import load_font, GlyphAtlas
+from logic import EVENT_LOCK, EVENT_CLEAR, EVENT_GARBAGE, EVENT_RESET, EVENT_RESTORE
+
+
+def fit_block_size(width, height, area_width, area_height, max_size=BLOCK_SIZE):
+    """
+    Picks the block size for a board so that it fits in an area.
+
+    Args:
+        width (int): The board width in cells.
+        height (int): The board height in cells.
+        area_width (int): The available width in pixels.
+        area_height (int): The available height in pixels.
+        max_size (int, optional): The largest block size to use. Defaults to BLOCK_SIZE.
+
+    Returns:
+        int: The block size in pixels, at least 1.
+    """
+    return max(1, min(max_size, area_width // width, area_height // height))
+
 
 class ArcadeUI:
     """
@@ -26,10 +50,19 @@ class ArcadeUI:
         """
         self.screen = screen 
         # Load various fonts for different UI elements.
-        self.font_main = pygame.font.SysFont("Consolas", 22, bold=True)
-        self.font_title = pygame.font.SysFont("Verdana", 40, bold=True)
-        self.font_pixel = pygame.font.SysFont("Comic Sans MS", 16, bold=True) 
-        self.font_small = pygame.font.SysFont("Consolas", 14, bold=True)
+        # `load_font` caches the resolved font files, so only the very first
+        # run pays for the system font scan that `SysFont` performs.
+        self.font_main = load_font("Consolas", 22, bold=True)
+        self.font_title = load_font("Verdana", 40, bold=True)
+        self.font_pixel = load_font("Comic Sans MS", 16, bold=True)
+        self.font_small = load_font("Consolas", 14, bold=True)
+        self.fonts = {"main": self.font_main, "title": self.font_title, "pixel": self.font_pixel, "small": self.font_small}
+        # Glyph atlases keyed by (font name, color), built the first time each is used.
+        self.atlases = {}
+        # Translucent ghost-piece blocks keyed by (color index, size), drawn once and reused.
+        self.ghost_sprites = {}
+        # The cached layer of the board `draw_mini_board` shows (see `BoardLayer`).
+        self.mini_layer = None
         
         # A simple counter that increments each frame to drive animations.
         self.animation_tick = 0
@@ -38,13 +71,30 @@ class ArcadeUI:
         """Increments the animation tick on each frame to create pulsing/breathing effects."""
         self.animation_tick += 0.1
 
+    def get_atlas(self, font, color):
+        """
+        Returns the glyph atlas for a font and color, building it on first use.
+
+        Args:
+            font (str): The font name ('main', 'title', 'pixel' or 'small').
+            color (tuple): The RGB text color.
+
+        Returns:
+            GlyphAtlas: The atlas used to compose text in that font and color.
+        """
+        key = (font, tuple(color))
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = self.atlases[key] = GlyphAtlas(self.fonts[font], color)
+        return atlas
+
     def truncate_text(self, text, font, max_width):
         """
         Truncates a string to fit within a maximum width, adding "..." at the end.
 
         Args:
             text (str): The text to truncate.
-            font (pygame.font.Font): The font used to render the text.
+            font (pygame.font.Font or GlyphAtlas): The font or atlas used to render the text.
             max_width (int): The maximum allowed width in pixels.
 
         Returns:
@@ -66,7 +116,7 @@ class ArcadeUI:
         for y in range(0, SCREEN_HEIGHT, 40):
             pygame.draw.line(self.screen, COLOR_GRID_LINE, (0, y), (SCREEN_WIDTH, y))
 
-    def draw_3d_block(self, x, y, color_tuple, size=BLOCK_SIZE):
+    def draw_3d_block(self, x, y, color_tuple, size=BLOCK_SIZE, surface=None):
         """
         Draws a single Tetris block with a pseudo-3D effect.
 
@@ -75,16 +125,62 @@ class ArcadeUI:
             y (int): The y-coordinate of the top-left corner.
             color_tuple (tuple): A tuple of (base, light, dark) colors.
             size (int, optional): The size of the block. Defaults to BLOCK_SIZE.
+            surface (pygame.Surface, optional): Where to draw. Defaults to the UI's screen.
         """
+        if surface is None:
+            surface = self.screen
         base_color, light_color, dark_color = color_tuple
         rect = (x, y, size, size)
-        pygame.draw.rect(self.screen, base_color, rect)
+        pygame.draw.rect(surface, base_color, rect)
         # Draw light highlights to create a top/left bevel.
-        pygame.draw.polygon(self.screen, light_color, [(x, y), (x + size, y), (x + size - 4, y + 4), (x + 4, y + 4)])
+        pygame.draw.polygon(surface, light_color, [(x, y), (x + size, y), (x + size - 4, y + 4), (x + 4, y + 4)])
         # Draw dark shadows to create a bottom/right bevel.
-        pygame.draw.polygon(self.screen, dark_color, [(x + size, y + size), (x, y + size), (x + 4, y + size - 4)])
+        pygame.draw.polygon(surface, dark_color, [(x + size, y + size), (x, y + size), (x + 4, y + size - 4)])
         # Draw a slightly smaller inner rectangle to complete the effect.
-        pygame.draw.rect(self.screen, base_color, (x + 8, y + 8, size - 16, size - 16))
+        pygame.draw.rect(surface, base_color, (x + 8, y + 8, size - 16, size - 16))
+
+    def make_block_sprite(self, color_tuple, size):
+        """
+        Draws one block onto its own surface, to be blitted instead of redrawn.
+
+        Blocks too small for the bevel of `draw_3d_block` get the simpler one from `tiled`.
+
+        Args:
+            color_tuple (tuple): A tuple of (base, light, dark) colors.
+            size (int): The size of the block.
+
+        Returns:
+            pygame.Surface: The block.
+        """
+        if size < 16:
+            from tiled import make_block_sprite
+            return make_block_sprite(color_tuple, size)
+        sprite = pygame.Surface((size, size))
+        self.draw_3d_block(0, 0, color_tuple, size, sprite)
+        return sprite
+
+    def draw_ghost_block(self, x, y, color_idx, size=BLOCK_SIZE):
+        """
+        Draws one block of the ghost (landing preview) piece.
+
+        The translucent sprite is built the first time a color is needed and
+        then only blitted.
+
+        Args:
+            x (int): The x-coordinate of the top-left corner.
+            y (int): The y-coordinate of the top-left corner.
+            color_idx (int): The index of the piece in SHAPE_COLORS.
+            size (int, optional): The size of the block. Defaults to BLOCK_SIZE.
+        """
+        key = (color_idx, size)
+        sprite = self.ghost_sprites.get(key)
+        if sprite is None:
+            base_color = SHAPE_COLORS[color_idx][0]
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            sprite.fill((*base_color, 50))
+            pygame.draw.rect(sprite, (*base_color, 170), (0, 0, size, size), 2)
+            self.ghost_sprites[key] = sprite
+        self.screen.blit(sprite, (x, y))
 
     def draw_neon_border(self, rect):
         """
@@ -127,16 +223,17 @@ class ArcadeUI:
             color (tuple): The RGB color of the text.
             font (str, optional): The font to use ('title' or 'main'). Defaults to "title".
         """
-        font_obj = self.font_title if font == "title" else self.font_main
+        font_key = "title" if font == "title" else "main"
         scale = 1.0 + (math.sin(self.animation_tick * 2) * 0.05)
-        base_surf = font_obj.render(text, True, color)
+        # The atlas caches the composed text, so only the scaling runs every frame.
+        base_surf = self.get_atlas(font_key, color).render(text)
         width = int(base_surf.get_width() * scale)
         height = int(base_surf.get_height() * scale)
         scaled_surf = pygame.transform.scale(base_surf, (width, height))
         rect = scaled_surf.get_rect(center=center_pos)
         
         # Draw a simple black shadow for better readability.
-        shadow_surf = font_obj.render(text, True, (0,0,0))
+        shadow_surf = self.get_atlas(font_key, (0, 0, 0)).render(text)
         shadow_surf = pygame.transform.scale(shadow_surf, (width, height))
         self.screen.blit(shadow_surf, (rect.x + 4, rect.y + 4))
         
@@ -166,7 +263,7 @@ class ArcadeUI:
         desc_rect = desc_surf.get_rect(center=(center_pos[0], center_pos[1] + 35))
         self.screen.blit(desc_surf, desc_rect)
 
-    def draw_sidebar(self, x, y, score, leaderboard, logic, current_username):
+    def draw_sidebar(self, x, y, score, leaderboard, logic, current_username, rival=None, height=GAME_AREA_HEIGHT):
         """
         Draws the entire right-hand sidebar, including player name, score, next piece, and leaderboard.
         
@@ -177,12 +274,16 @@ class ArcadeUI:
             leaderboard (list): The list of top players and scores.
             logic (TetrisLogic): The game logic object, used to get the next piece.
             current_username (str): The current player's name.
+            rival (TetrisLogic, optional): In versus mode, the opponent's game, shown
+                                           instead of the leaderboard. Defaults to None.
+            height (int, optional): The height of the game area, which the sidebar
+                                    lines up with. Defaults to GAME_AREA_HEIGHT.
         """
         current_y = y 
 
         # 1. Player Name Panel
         self.draw_panel((x, current_y, 250, 50), "PILOT")
-        name_surf = self.font_main.render(current_username, True, (0, 255, 255))
+        name_surf = self.get_atlas("main", (0, 255, 255)).render(current_username)
         name_rect = name_surf.get_rect(center=(x + 125, current_y + 30))
         self.screen.blit(name_surf, name_rect)
         
@@ -218,9 +319,14 @@ class ArcadeUI:
 
         # 4. Leaderboard Panel
         # Calculate the remaining height to fill the space down to the bottom of the game area.
-        remaining_height = (GAME_AREA_HEIGHT + y) - current_y
+        remaining_height = (height + y) - current_y
         if remaining_height < 200: remaining_height = 300 # Ensure a minimum height.
 
+        if rival is not None:
+            self.draw_panel((x, current_y, 250, remaining_height), "RIVAL")
+            self.draw_mini_board(x + 125, current_y + 30, remaining_height - 40, rival)
+            return
+
         self.draw_panel((x, current_y, 250, remaining_height), "TOP PILOTS")
         
         # Draw the top 10 leaderboard entries.
@@ -237,17 +343,46 @@ class ArcadeUI:
             rank_str = f"{i+1}."
             name_str = f" {user['name']}"
             
-            # Render rank, name (truncated), and score.
-            rank_surf = self.font_small.render(rank_str, True, rank_color)
-            self.screen.blit(rank_surf, (x + 15, row_y))
+            # Compose rank, name (truncated), and score from the glyph atlases.
+            rank_atlas = self.get_atlas("small", rank_color)
+            name_atlas = self.get_atlas("small", (220, 220, 220))
+            self.screen.blit(rank_atlas.render(rank_str), (x + 15, row_y))
             
-            name_surf = self.font_small.render(self.truncate_text(name_str, self.font_small, 130), True, (220, 220, 220))
+            name_surf = name_atlas.render(self.truncate_text(name_str, name_atlas, 130))
             self.screen.blit(name_surf, (x + 40, row_y))
             
-            score_surf = self.font_small.render(str(user['score']), True, rank_color)
+            score_surf = rank_atlas.render(str(user['score']))
             score_rect = score_surf.get_rect(right=x + 235, centery=row_y + 8)
             self.screen.blit(score_surf, score_rect)
 
+    def draw_mini_board(self, center_x, top, max_height, logic):
+        """
+        Draws a small version of a game's board and falling piece.
+
+        The locked cells come from a cached `BoardLayer`, so a frame without a
+        lock costs one blit plus the piece, whatever the board size.
+
+        Args:
+            center_x (int): The horizontal center of the board.
+            top (int): The y-coordinate of the board's top edge.
+            max_height (int): The available height; the cell size is chosen to fit.
+            logic (TetrisLogic): The game to draw.
+        """
+        size = max(1, min(max_height // logic.height, 230 // logic.width, 20))
+        layer = self.mini_layer
+        if layer is None or layer.logic is not logic or layer.block_size != size:
+            # A new rival (or a new size): stop following the old game.
+            if layer is not None:
+                layer.close()
+            layer = self.mini_layer = BoardLayer(self, logic, size)
+        left = center_x - logic.width * size // 2
+        self.screen.blit(layer.update(), (left, top))
+        if logic.current_piece and not logic.game_over:
+            sprite = layer.sprites[logic.current_color_idx + 1]
+            self.screen.blits([(sprite, (left + (logic.piece_x + cx) * size, top + (logic.piece_y + cy) * size))
+                               for cy, row in enumerate(logic.current_piece) for cx, val in enumerate(row) if val],
+                              doreturn=False)
+
     def draw_overlay_controls(self):
         """Draws the 'How to Play' overlay screen."""
         overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -272,4 +407,83 @@ class ArcadeUI:
         self.draw_button_circle("Pause", (center_x + 1.5*gap_x, start_y), (255, 200, 50), "P", 35)
 
         msg = self.font_pixel.render("PRESS ENTER TO START GAME", True, (150, 150, 150))
-        self.screen.blit(msg, (center_x - 130, center_y + 120))
\ No newline at end of file
+        self.screen.blit(msg, (center_x - 130, center_y + 120))
+
+
+class BoardLayer:
+    """
+    The locked cells of one game, kept on a cached surface and redrawn row by row.
+
+    The layer listens to the game's events to learn which rows may have changed
+    (the rows a piece locked into, the rows above a clear, every row after
+    garbage, a reset or a restore), and redraws a candidate row only if its
+    Zobrist row hash differs from the one it was drawn with. A frame with no
+    lock redraws nothing; a lock redraws a few rows of blitted sprites.
+    """
+    def __init__(self, ui, logic, block_size):
+        """
+        Allocates the surface and the block sprites and starts following the game.
+
+        Args:
+            ui (ArcadeUI): Draws the block sprites.
+            logic (TetrisLogic): The game whose board is drawn.
+            block_size (int): The cell size in pixels.
+        """
+        self.logic = logic
+        self.block_size = block_size
+        width = logic.width * block_size
+        self.surface = pygame.Surface((width, logic.height * block_size))
+        # Sprites indexed by board value (index 0 is unused), shared with the falling piece.
+        self.sprites = [None] + [ui.make_block_sprite(colors, block_size) for colors in SHAPE_COLORS]
+        # An empty row with its grid lines, blitted under every redrawn row.
+        self.empty_row = pygame.Surface((width, block_size))
+        self.empty_row.fill((10, 10, 20))
+        if block_size >= 6:
+            for x in range(logic.width):
+                pygame.draw.rect(self.empty_row, (20, 20, 40), (x * block_size, 0, block_size, block_size), 1)
+        # The row hash each row was last drawn with (None: never drawn), and the rows to check.
+        self.drawn = [None] * logic.height
+        self.dirty = set(range(logic.height))
+        self.redrawn_rows = 0
+        logic.add_listener(self.on_logic_event)
+
+    def on_logic_event(self, event, data):
+        """Marks the rows an event may have changed."""
+        if event == EVENT_LOCK:
+            self.dirty.update(y for _, y, _ in data["cells"])
+        elif event == EVENT_CLEAR:
+            # Everything above the lowest cleared row moved down.
+            self.dirty.update(range(max(data["rows"]) + 1))
+        elif event in (EVENT_GARBAGE, EVENT_RESET, EVENT_RESTORE):
+            self.dirty.update(range(self.logic.height))
+
+    def update(self):
+        """
+        Redraws the rows that changed since the last call.
+
+        Returns:
+            pygame.Surface: The board's locked cells.
+        """
+        if self.dirty:
+            row_hashes = self.logic.row_hashes
+            drawn = self.drawn
+            for y in self.dirty:
+                if row_hashes[y] != drawn[y]:
+                    self.redraw_row(y)
+                    drawn[y] = row_hashes[y]
+            self.dirty.clear()
+        return self.surface
+
+    def redraw_row(self, y):
+        """Redraws one row from the board in a single batched blit."""
+        size = self.block_size
+        top = y * size
+        sprites = self.sprites
+        self.surface.blit(self.empty_row, (0, top))
+        self.surface.blits([(sprites[val], (x * size, top)) for x, val in enumerate(self.logic.board[y]) if val],
+                           doreturn=False)
+        self.redrawn_rows += 1
+
+    def close(self):
+        """Stops following the game."""
+        self.logic.remove_listener(self.on_logic_event)
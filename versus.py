@@ -0,0 +1,344 @@
+# versus.py
+"""
+Head-to-head versus mode with input-only lockstep netcode and rollback.
+
+Every player runs the same set of `TetrisLogic` games, one per player, all
+seeded with the seed the relay hands out, so the pieces dealt are identical.
+Only inputs cross the wire: each simulation tick a player's input is one byte
+of INPUT_* bits, and every peer applies the same inputs to the same games in
+the same order, so all boards stay identical without ever being sent.
+
+Remote inputs arrive late. Instead of waiting for them, `VersusSession`
+predicts "no input" and keeps simulating. When the real input for an earlier
+tick turns out to be different, the session rolls back: it restores every game
+from the snapshot taken after the tick before, and re-simulates up to the
+present with the corrected inputs. Snapshots are the small immutable
+`GameSnapshot`s, one per game per tick, kept in a ring buffer that covers the
+rollback window. If a peer falls further behind than the window, the session
+stalls until its inputs catch up (plain lockstep).
+
+The re-run ticks were already shown once, so the games are marked as
+`replaying` meanwhile and their events do not reach effects, telemetry or
+spectators a second time. Each game whose state the rollback changed then
+emits a single "restore" event, which those listeners already handle.
+
+Clearing lines sends garbage: the attack from GARBAGE_TABLE first cancels the
+player's own pending garbage, and the rest is queued for the next opponent
+still in the game. Pending garbage rises into a player's board when they lock
+a piece without clearing anything.
+
+Local inputs are scheduled `input_delay` ticks ahead, which hides most of the
+network latency and keeps rollbacks short.
+"""
+from input_manager import ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_SOFT_DROP, ACTION_HARD_DROP
+from logic import TetrisLogic, EVENT_CLEAR, EVENT_RESTORE
+from settings import SIM_TICK_MS, GRAVITY_MS
+
+# --- Input Bits ---
+# One simulation tick of input for one player, applied in this order.
+INPUT_ROTATE = 1
+INPUT_LEFT = 2
+INPUT_RIGHT = 4
+INPUT_SOFT_DROP = 8
+INPUT_HARD_DROP = 16
+
+ACTION_BITS = {
+    ACTION_ROTATE: INPUT_ROTATE,
+    ACTION_LEFT: INPUT_LEFT,
+    ACTION_RIGHT: INPUT_RIGHT,
+    ACTION_SOFT_DROP: INPUT_SOFT_DROP,
+    ACTION_HARD_DROP: INPUT_HARD_DROP,
+}
+
+# Garbage rows sent for clearing 0, 1, 2, 3 or 4 lines at once.
+GARBAGE_TABLE = (0, 0, 1, 2, 4)
+
+# Ticks between two gravity drops.
+GRAVITY_TICKS = max(1, round(GRAVITY_MS / SIM_TICK_MS))
+
+
+def actions_to_bits(actions):
+    """
+    Packs the actions of one simulation step into input bits.
+
+    Args:
+        actions (list): (action, is_repeat) pairs from `InputManager.pop_actions`.
+
+    Returns:
+        int: The INPUT_* bits.
+    """
+    bits = 0
+    for action, _ in actions:
+        bits |= ACTION_BITS[action]
+    return bits
+
+
+def apply_input(logic, bits, gravity):
+    """
+    Advances one game by one tick. Deterministic: the same game, bits and
+    gravity flag always produce the same result.
+
+    Args:
+        logic (TetrisLogic): The game.
+        bits (int): The INPUT_* bits for this tick.
+        gravity (bool): Whether gravity pulls the piece down this tick.
+
+    Returns:
+        bool: True if a piece locked.
+    """
+    if logic.game_over:
+        return False
+    if bits & INPUT_ROTATE:
+        logic.rotate()
+    if bits & INPUT_LEFT:
+        logic.move(-1, 0)
+    if bits & INPUT_RIGHT:
+        logic.move(1, 0)
+    if bits & INPUT_SOFT_DROP:
+        logic.move(0, 1)
+    if bits & INPUT_HARD_DROP:
+        while logic.move(0, 1): pass
+        logic.lock_piece()
+        return True
+    if gravity and not logic.move(0, 1):
+        logic.lock_piece()
+        return True
+    return False
+
+
+class VersusSession:
+    """
+    Runs every player's game in lockstep from inputs, with prediction and rollback.
+
+    Feed local input with `step()`, send what `take_outbox()` returns to the
+    peers, and pass their inputs to `receive_input()`.
+    """
+    def __init__(self, num_players, local_player, seed, input_delay=2, max_rollback=12, logics=None):
+        """
+        Creates the games and the rollback history.
+
+        Args:
+            num_players (int): How many players are in the match.
+            local_player (int): The index of the player on this machine.
+            seed (int): The shared seed; every game deals the same pieces.
+            input_delay (int, optional): Ticks between a local input and the tick it applies to. Defaults to 2.
+            max_rollback (int, optional): How many unconfirmed ticks may be predicted before stalling.
+                                          Defaults to 12.
+            logics (list, optional): Existing games to use (e.g., the one the window
+                                     draws); they are reset with the shared seed. Defaults to new games.
+        """
+        self.num_players = num_players
+        self.local_player = local_player
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.logics = logics or [TetrisLogic() for _ in range(num_players)]
+        self.lines_cleared = [0] * num_players
+        self.counters = [self._clear_counter(i) for i in range(num_players)]
+        for logic, counter in zip(self.logics, self.counters):
+            logic.reset(seed)
+            # The counter also runs during rollbacks: the re-run ticks need the line counts.
+            logic.add_listener(counter, replay=True)
+        # Garbage rows waiting to rise into each player's board.
+        self.pending_garbage = [0] * num_players
+        # The tick on which each player topped out, or None while they are still in the game.
+        self.topped_out = [None] * num_players
+
+        self.tick = 0
+        # Known inputs per player: tick -> bits. The first `input_delay` ticks are empty for everyone.
+        self.inputs = [{t: 0 for t in range(1, input_delay + 1)} for _ in range(num_players)]
+        # The last tick whose input is known, per player. Inputs arrive in order.
+        self.confirmed = [input_delay] * num_players
+        # Inputs for ticks before this one have been discarded.
+        self.forgotten_tick = 1
+        # The earliest tick that was simulated with a wrong prediction, if any.
+        self.rollback_from = None
+        # State after each of the last `max_rollback + 1` ticks, indexed by tick modulo the ring size.
+        self.history = [None] * (max_rollback + 1)
+        self._save_state()
+        # Local inputs not yet handed to the network: (tick, bits) pairs.
+        self.outbox = []
+        self.rollbacks = 0
+        self.resimulated_ticks = 0
+
+    def _clear_counter(self, player):
+        """Creates the listener that counts the lines a player clears during a tick."""
+        def on_event(event, data):
+            if event == EVENT_CLEAR:
+                self.lines_cleared[player] += data["lines"]
+        return on_event
+
+    def _save_state(self):
+        """Stores the state after the current tick in the history ring."""
+        self.history[self.tick % len(self.history)] = (
+            self.tick, [logic.snapshot() for logic in self.logics], list(self.pending_garbage),
+            list(self.topped_out))
+
+    def _load_state(self, tick):
+        """Restores every game to the state saved after `tick`."""
+        saved_tick, snapshots, pending, topped_out = self.history[tick % len(self.history)]
+        assert saved_tick == tick, "rollback target is outside the history window"
+        for logic, snap in zip(self.logics, snapshots):
+            logic.restore(snap)
+        self.pending_garbage = list(pending)
+        self.topped_out = list(topped_out)
+        self.tick = tick
+
+    def _simulate_tick(self):
+        """Advances every game by one tick with the known or predicted inputs."""
+        self.tick += 1
+        tick = self.tick
+        gravity = tick % GRAVITY_TICKS == 0
+        for player, logic in enumerate(self.logics):
+            if logic.game_over:
+                continue
+            self.lines_cleared[player] = 0
+            # Unknown remote inputs are predicted as "no input".
+            if not apply_input(logic, self.inputs[player].get(tick, 0), gravity):
+                continue
+            lines = self.lines_cleared[player]
+            if lines:
+                attack = GARBAGE_TABLE[min(lines, 4)]
+                cancelled = min(attack, self.pending_garbage[player])
+                self.pending_garbage[player] -= cancelled
+                target = self._next_opponent(player)
+                if target is not None:
+                    self.pending_garbage[target] += attack - cancelled
+            elif self.pending_garbage[player]:
+                logic.add_garbage(self.pending_garbage[player])
+                self.pending_garbage[player] = 0
+        for player, logic in enumerate(self.logics):
+            if logic.game_over and self.topped_out[player] is None:
+                self.topped_out[player] = tick
+        self._save_state()
+
+    def _next_opponent(self, player):
+        """Returns the next player after `player` who is still in the game, or None."""
+        for offset in range(1, self.num_players):
+            other = (player + offset) % self.num_players
+            if not self.logics[other].game_over:
+                return other
+        return None
+
+    def confirmed_tick(self):
+        """Returns the last tick for which every player's input is known."""
+        return min(self.confirmed)
+
+    def can_advance(self):
+        """Returns True if the next tick stays within the rollback window."""
+        return self.tick + 1 - self.confirmed_tick() <= self.max_rollback
+
+    def receive_input(self, player, tick, bits):
+        """
+        Records a remote player's input, scheduling a rollback if it was mispredicted.
+
+        Args:
+            player (int): The player the input belongs to.
+            tick (int): The tick it applies to.
+            bits (int): The INPUT_* bits.
+        """
+        inputs = self.inputs[player]
+        if tick in inputs:
+            return
+        inputs[tick] = bits
+        self.confirmed[player] = max(self.confirmed[player], tick)
+        if tick <= self.tick and bits:
+            # This tick was simulated with a prediction of 0.
+            if self.rollback_from is None or tick < self.rollback_from:
+                self.rollback_from = tick
+
+    def synchronize(self):
+        """Performs a pending rollback: restores the last correct state and re-simulates to the present."""
+        if self.rollback_from is None:
+            return
+        present = self.tick
+        before = [logic.snapshot() for logic in self.logics]
+        for logic in self.logics:
+            logic.replaying = True
+        try:
+            self._load_state(self.rollback_from - 1)
+            self.rollback_from = None
+            self.rollbacks += 1
+            while self.tick < present:
+                self._simulate_tick()
+                self.resimulated_ticks += 1
+        finally:
+            for logic in self.logics:
+                logic.replaying = False
+        # Listeners skipped the re-run; games that ended up somewhere else resync once.
+        for logic, snap in zip(self.logics, before):
+            if logic.listeners and logic.snapshot() != snap:
+                logic.emit(EVENT_RESTORE, {})
+
+    def step(self, bits):
+        """
+        Records the local input for a future tick and simulates the next tick.
+
+        Args:
+            bits (int): The local player's INPUT_* bits.
+
+        Returns:
+            bool: False if the session is stalled waiting for remote inputs
+                  (nothing was recorded or simulated), True otherwise.
+        """
+        self.synchronize()
+        if not self.can_advance():
+            return False
+        tick = self.tick + 1 + self.input_delay
+        self.inputs[self.local_player][tick] = bits
+        self.confirmed[self.local_player] = tick
+        self.outbox.append((tick, bits))
+        self._simulate_tick()
+        self._forget_old_inputs()
+        return True
+
+    def _forget_old_inputs(self):
+        """Drops inputs for ticks that can no longer be rolled back to."""
+        oldest = min(self.tick, self.confirmed_tick()) - self.max_rollback
+        while self.forgotten_tick < oldest:
+            for inputs in self.inputs:
+                inputs.pop(self.forgotten_tick, None)
+            self.forgotten_tick += 1
+
+    def take_outbox(self):
+        """
+        Returns and clears the local inputs that still have to be sent.
+
+        Returns:
+            list: (tick, bits) pairs in tick order.
+        """
+        outbox, self.outbox = self.outbox, []
+        return outbox
+
+    def close(self):
+        """Detaches the session from the games, which may outlive it (e.g., the window's game)."""
+        for logic, counter in zip(self.logics, self.counters):
+            logic.remove_listener(counter)
+
+    def state_key(self):
+        """Returns a hash of every game's state, for comparing peers (desync checks)."""
+        return hash(tuple(logic.snapshot().key for logic in self.logics))
+
+    def winner(self):
+        """
+        Returns the result of the match, once it is final.
+
+        The match ends on the tick when at most one player is left, and the
+        result is read at that tick, so a local game that keeps running ahead
+        of the confirmed inputs cannot turn a win into a draw.
+
+        Returns:
+            int: The index of the last player standing, -1 if everyone topped out
+                 on the same tick, or None while the match is still running or
+                 depends on unconfirmed inputs. Call `synchronize()` first: while a
+                 rollback is pending, the games show a misprediction and this is None.
+        """
+        if self.rollback_from is not None:
+            return None
+        ended = sorted(tick for tick in self.topped_out if tick is not None)
+        if len(ended) < self.num_players - 1:
+            return None
+        end = ended[self.num_players - 2]
+        if end > self.confirmed_tick():
+            return None
+        alive = [i for i, tick in enumerate(self.topped_out) if tick is None or tick > end]
+        return alive[0] if alive else -1